@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import cartopy
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+import matplotlib
+import matplotlib.image as mimage
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Capas del mapa base: (nombre, característica de cartopy, opciones de dibujo)
+CAPAS_MAPA = (
+    ('coastline', cfeature.COASTLINE, {}),
+    ('borders', cfeature.BORDERS, {}),
+    ('states', cfeature.STATES, {}),
+    ('land', cfeature.LAND, {'edgecolor': 'black'}),
+    ('ocean', cfeature.OCEAN, {}),
+    ('lakes', cfeature.LAKES, {'edgecolor': 'black'}),
+    ('rivers', cfeature.RIVERS, {}),
+)
+
+DIRECTORIO_CACHE = os.environ.get('TORNADO_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'tornado_simulator'))
+TAMANO_MAXIMO_CACHE = int(os.environ.get('TORNADO_CACHE_MB', 200)) * 1024 * 1024
+
+
+def agregar_capas(ax):
+    for _, capa, opciones in CAPAS_MAPA:
+        ax.add_feature(capa, **opciones)
+
+
+def clave_basemap(extent, proyeccion, ancho, alto, dpi):
+    # Cualquier cambio en la extensión, la proyección, el tamaño en píxeles, el DPI, las capas
+    # o las versiones de cartopy/matplotlib produce otra clave (y por lo tanto otro archivo)
+    datos = {
+        'extent': [float(v) for v in extent],
+        'proyeccion': proyeccion.proj4_init,
+        'pixeles': [int(ancho), int(alto)],
+        'dpi': float(dpi),
+        'capas': [(nombre, opciones) for nombre, _, opciones in CAPAS_MAPA],
+        'cartopy': cartopy.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+    return hashlib.sha1(json.dumps(datos, sort_keys=True).encode()).hexdigest()
+
+
+def renderizar_basemap(extent, proyeccion, ancho, alto, dpi):
+    # Dibuja solo las capas, sin bordes ni márgenes, en una figura fuera de pantalla del tamaño
+    # en píxeles del eje del mapa
+    fig = Figure(figsize=(ancho / dpi, alto / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1], projection=proyeccion)
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    ax.set_aspect('auto')
+    ax.spines['geo'].set_visible(False)
+    agregar_capas(ax)
+    fig.canvas.draw()
+    return fig.canvas.buffer_rgba()
+
+
+def tamano_eje(ax):
+    # Tamaño en píxeles del eje ya ajustado a la relación de aspecto del mapa
+    ax.apply_aspect()
+    posicion = ax.get_position()
+    ancho, alto = ax.figure.get_size_inches() * ax.figure.dpi
+    return round(posicion.width * ancho), round(posicion.height * alto)
+
+
+def obtener_basemap(ax, extent, directorio=DIRECTORIO_CACHE, tamano_maximo=TAMANO_MAXIMO_CACHE):
+    # Devuelve la imagen RGBA del mapa base para el eje, desde el caché en disco si existe
+    ancho, alto = tamano_eje(ax)
+    dpi = ax.figure.dpi
+    ruta = os.path.join(directorio, clave_basemap(extent, ax.projection, ancho, alto, dpi) + '.png')
+
+    if os.path.exists(ruta):
+        os.utime(ruta)  # Marca de uso para el desalojo LRU
+        return mimage.imread(ruta)
+
+    imagen = renderizar_basemap(extent, ax.projection, ancho, alto, dpi)
+    os.makedirs(directorio, exist_ok=True)
+    temporal = ruta + '.tmp'
+    mimage.imsave(temporal, imagen, format='png')
+    os.replace(temporal, ruta)  # Escritura atómica: otro proceso nunca ve un PNG a medias
+    desalojar(directorio, tamano_maximo)
+    return mimage.imread(ruta)
+
+
+def desalojar(directorio, tamano_maximo):
+    # Borra los mapas usados hace más tiempo hasta que el caché quede bajo el tamaño máximo
+    archivos = [os.path.join(directorio, nombre) for nombre in os.listdir(directorio) if nombre.endswith('.png')]
+    archivos.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(archivo) for archivo in archivos)
+    for archivo in archivos[:-1]:  # El más reciente (el que se acaba de usar) nunca se borra
+        if total <= tamano_maximo:
+            break
+        total -= os.path.getsize(archivo)
+        os.remove(archivo)
+
+
+def dibujar_basemap(ax, extent, usar_cache=True):
+    # Mapa base del eje: una sola imagen desde el caché, o las capas vectoriales de cartopy
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    if not usar_cache:
+        agregar_capas(ax)
+        return None
+    imagen = obtener_basemap(ax, extent)
+    artista = ax.imshow(imagen, origin='upper', extent=extent, transform=ccrs.PlateCarree(),
+                        interpolation='nearest', zorder=0)
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    return artista
@@ -0,0 +1,435 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from particle_pool import FRACCION_COMPACTACION, ParticlePool
+from tornado_checkpoint import Checkpointer, cargar
+from tornado_engine import TornadoEngine
+from tornado_kernels import INTEGRADORES, NUCLEOS
+from simulation_clock import SimulationClock
+
+
+def add_particle_original(sim, x, y, vx, vy, life_time):
+    # Emisor original: una partícula por iteración con np.append y velocidad escalar
+    for _ in range(sim.particles_per_second):
+        angle = np.random.uniform(0, 2 * np.pi)
+        radius = np.random.uniform(0, sim.radius_max)
+        new_x = radius * np.cos(angle)
+        new_y = radius * np.sin(angle)
+        r = np.sqrt(new_x**2 + new_y**2)
+        if r < sim.R0:
+            v_theta = sim.circulation / (2 * np.pi * sim.R0)
+        else:
+            v_theta = sim.circulation / (2 * np.pi * r)
+        theta = np.arctan2(new_y, new_x)
+        new_vx = v_theta * np.cos(theta + np.pi / 2)
+        new_vy = v_theta * np.sin(theta + np.pi / 2)
+
+        x = np.append(x, new_x)
+        y = np.append(y, new_y)
+        vx = np.append(vx, new_vx)
+        vy = np.append(vy, new_vy)
+        life_time = np.append(life_time, sim.particle_lifetime)
+    return x, y, vx, vy, life_time
+
+
+def paso_original(x, y, vx, vy, circulation, radius_max, max_velocidad):
+    # Física original de update: una docena de arreglos temporales por frame
+    dx = 0 - x
+    dy = 0 - y
+    dist = np.sqrt(dx**2 + dy**2)
+    dist = np.clip(dist, 0.01, radius_max)
+    v_theta = circulation / (2 * np.pi * dist)
+    vx = v_theta * -dy / dist
+    vy = v_theta * dx / dist
+    vy += 0.0002 * dist
+    velocidad = np.sqrt(vx**2 + vy**2)
+    vx = np.where(velocidad > max_velocidad, vx * max_velocidad / velocidad, vx)
+    vy = np.where(velocidad > max_velocidad, vy * max_velocidad / velocidad, vy)
+    x += vx
+    y += vy
+    return dist
+
+
+def memoria_temporal(funcion):
+    # Pico de memoria asignada durante la llamada, expresado en arreglos float64 de tamaño N;
+    # sirve como contador de temporales para detectar regresiones del núcleo en el lugar
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return pico
+
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def benchmark_emision(lotes=(100, 1000, 10000, 100000)):
+    sim = TornadoEngine()
+    print(f'{"lote":>8} {"antes (part/s)":>16} {"después (part/s)":>18} {"aceleración":>12}')
+    for n in lotes:
+        # El emisor original es O(N^2): se limita el tamaño medido para que termine
+        n_antes = min(n, 10000)
+        sim.particles_per_second = n_antes
+        vacio = np.array([])
+        t_antes = medir(lambda: add_particle_original(sim, vacio, vacio, vacio, vacio, vacio), 1)
+        tasa_antes = n_antes / t_antes
+
+        t_despues = medir(lambda: sim.spawn(n), 10)
+        tasa_despues = n / t_despues
+
+        print(f'{n:>8} {tasa_antes:>16.3e} {tasa_despues:>18.3e} {tasa_despues / tasa_antes:>11.1f}x')
+
+
+def benchmark_paso(tamanos=(10**4, 10**5, 10**6), repeticiones=20, dtype=np.float64, nucleo='numpy'):
+    print(f'Paso de física (núcleo {nucleo}, {np.dtype(dtype).name})')
+    print(f'{"N":>8} {"antes (ms)":>11} {"después (ms)":>13} {"aceleración":>12} {"temporales antes":>17} {"temporales después":>19}')
+    for n in tamanos:
+        sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'), dtype=dtype,
+                            nucleo=nucleo)
+        sim.spawn(n)
+        sim.step()  # Asigna los buffers auxiliares antes de medir
+
+        # La referencia es siempre la física original en float64
+        x, y, vx, vy = (sim.x.astype(np.float64), sim.y.astype(np.float64),
+                        sim.vx.astype(np.float64), sim.vy.astype(np.float64))
+        original = lambda: paso_original(x, y, vx, vy, sim.circulation, sim.radius_max, sim.max_velocidad)
+
+        t_antes = medir(original, repeticiones)
+        t_despues = medir(sim.step, repeticiones)
+        temporales_antes = memoria_temporal(original) / (8 * n)
+        temporales_despues = memoria_temporal(sim.step) / (8 * n)
+
+        print(f'{n:>8} {1e3 * t_antes:>11.2f} {1e3 * t_despues:>13.2f} {t_antes / t_despues:>11.1f}x '
+              f'{temporales_antes:>17.1f} {temporales_despues:>19.1f}')
+
+
+def benchmark_hilos(n=10**7, hilos=(1, 2, 4, 8), pasos=10, dtype=np.float64):
+    print(f'Paso de física en hilos (N = {n:.0e}, {np.dtype(dtype).name})')
+    print(f'{"hilos":>6} {"bloque":>8} {"ms/paso":>9} {"aceleración":>12}')
+    referencia = None
+    for k in hilos:
+        sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'), dtype=dtype, hilos=k)
+        sim.spawn(n)
+        sim.step()  # Ajusta el bloque y asigna los buffers antes de medir
+        t = medir(sim.step, pasos)
+        sim.close()
+        referencia = referencia or t
+        print(f'{k:>6} {sim.tamano_bloque:>8} {1e3 * t:>9.2f} {referencia / t:>11.1f}x')
+        del sim
+
+
+def benchmark_eliminacion(n=10**6, muertes=(10, 1000, 10000, 100000), repeticiones=5):
+    # Muertes en posiciones arbitrarias: máscara booleana sobre los cinco arreglos (original)
+    # contra swap-remove en el pool, que solo mueve las partículas que llenan los huecos
+    print(f'Eliminación de partículas sueltas (N = {n:.0e})')
+    print(f'{"muertes":>8} {"máscara (ms)":>13} {"swap-remove (ms)":>17} {"aceleración":>12}')
+    rng = np.random.default_rng(0)
+    campos = [rng.random(n) for _ in range(5)]
+    for k in muertes:
+        muertos = rng.choice(n, size=k, replace=False)
+
+        def mascara():
+            vivos = np.ones(n, dtype=bool)
+            vivos[muertos] = False
+            return [campo[vivos] for campo in campos]
+        antes = medir(mascara, repeticiones)
+
+        tiempos = []
+        for _ in range(repeticiones):
+            sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'))
+            sim.spawn(n)
+            inicio = time.perf_counter()
+            sim.eliminar(muertos)
+            tiempos.append(time.perf_counter() - inicio)
+        despues = min(tiempos)
+        print(f'{k:>8} {1e3 * antes:>13.3f} {1e3 * despues:>17.3f} {antes / despues:>11.1f}x')
+
+
+def benchmark_atributos(n=10**6, lote=10**4, atributos=(0, 2, 4, 8), repeticiones=10):
+    # Costo de los atributos registrados: el paso no los toca y la emisión solo los llena con
+    # su valor por defecto, así que los temporales no deberían crecer con la cantidad
+    print(f'Atributos registrados (N = {n:.0e}, lote de emisión {lote})')
+    print(f'{"atributos":>10} {"emisión (ms)":>13} {"paso (ms)":>10} {"temporales emisión":>19} {"temporales paso":>16}')
+    for k in atributos:
+        sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'))
+        for i in range(k):
+            sim.registrar_atributo(f'atributo_{i}', dtype=np.float32 if i % 2 else np.float64, defecto=i)
+        sim.spawn(n)
+        sim.step()
+        emision = lambda: sim.spawn(lote)
+        t_emision = medir(emision, repeticiones)
+        t_paso = medir(sim.step, repeticiones)
+        temporales_emision = memoria_temporal(emision) / (8 * lote)
+        temporales_paso = memoria_temporal(sim.step) / (8 * len(sim))
+        print(f'{k:>10} {1e3 * t_emision:>13.3f} {1e3 * t_paso:>10.2f} {temporales_emision:>19.1f} '
+              f'{temporales_paso:>16.1f}')
+
+
+def benchmark_integradores(n=20000, segundos=4.0, casos=(('euler', 1 / 50, None), ('euler', 1 / 800, None),
+                                                         ('rk2', 1 / 50, None), ('rk2', 1 / 50, 0.1),
+                                                         ('rk4', 1 / 50, None), ('rk4', 1 / 10, 0.2),
+                                                         ('rotacion', 1 / 50, None), ('rotacion', 1 / 10, None))):
+    # Error de posición tras `segundos` contra una referencia RK4 con pasos muy finos, y el costo
+    # de llegar ahí: Euler necesita pasos diminutos; los demás logran más precisión con menos pasos
+    def correr(dt, **opciones):
+        sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'), **opciones)
+        sim.spawn(n)
+        pasos = round(segundos / dt)
+        inicio = time.perf_counter()
+        sim.run(pasos, dt)
+        return sim, pasos, time.perf_counter() - inicio
+
+    referencia, _, _ = correr(1 / 800, integrador='rk4', angulo_maximo=0.01)
+    radio = np.hypot(referencia.x, referencia.y)
+    print(f'Integradores (N = {n}, {segundos:g} s simulados, referencia RK4 con dt = 1/800 y subpasos)')
+    print(f'{"integrador":>10} {"dt":>7} {"subpasos":>9} {"pasos":>6} {"ms":>8} {"error medio":>12} '
+          f'{"error máx":>10} {"deriva radial":>14}')
+    for integrador, dt, angulo in casos:
+        sim, pasos, t = correr(dt, integrador=integrador, angulo_maximo=angulo)
+        error = np.hypot(sim.x - referencia.x, sim.y - referencia.y)
+        deriva = np.abs(np.hypot(sim.x, sim.y) - radio).mean()
+        subpasos = '-' if angulo is None else f'{angulo:g} rad'
+        print(f'{integrador:>10} {f"1/{round(1 / dt)}":>7} {subpasos:>9} {pasos:>6} {1e3 * t:>8.1f} {error.mean():>12.2e} '
+              f'{error.max():>10.2e} {deriva:>14.2e}')
+
+
+def error_trayectorias(referencia, prueba, n=10000, pasos=1000):
+    # Avanza dos motores con la misma semilla y devuelve la mayor diferencia de posición
+    motores = []
+    for opciones in (referencia, prueba):
+        sim = TornadoEngine(seed=0, particles_per_second=0, particle_lifetime=float('inf'),
+                            max_velocidad=0.5, **opciones)
+        sim.spawn(n)
+        sim.run(pasos)
+        motores.append(sim)
+
+    a, b = motores
+    return max(np.abs(b.x - a.x).max(), np.abs(b.y - a.y).max())
+
+
+def validar(nombre, referencia, prueba, tolerancia, pasos=1000):
+    error = error_trayectorias(referencia, prueba, pasos=pasos)
+    estado = 'OK' if error <= tolerancia else 'FALLA'
+    print(f'{nombre} tras {pasos} pasos: error máximo {error:.2e} (tolerancia {tolerancia:.0e}) {estado}')
+    return error <= tolerancia
+
+
+def validar_emision(casos=((0.1, 200), (1, 20), (37, 20), (1000, 20), (10**7, 0.5)), dts=(1 / 50, 1 / 7)):
+    # El emisor continuo debe emitir tasa * tiempo partículas (salvo la fracción pendiente) para
+    # cualquier tasa y tamaño de paso; el emisor por frames original dividía por cero arriba de 50/s.
+    # Con tiempo de vida 0 cada lote expira en el mismo paso, así que la memoria no crece
+    ok = True
+    for dt in dts:
+        for tasa, segundos in casos:
+            sim = TornadoEngine(seed=0, particles_per_second=tasa, particle_lifetime=0.0)
+            pasos = round(segundos / dt)
+            sim.run(pasos, dt)
+            esperadas = tasa * pasos * dt
+            bien = abs(sim.pool.siguiente_id - esperadas) < 1
+            ok &= bien
+            print(f'Emisión {tasa:g}/s, dt = {dt:.4f} s, {pasos * dt:g} s: {sim.pool.siguiente_id} '
+                  f'(esperadas {esperadas:.1f}) {"OK" if bien else "FALLA"}')
+    return ok
+
+
+def validar_reloj(frames=300, dt=1 / 50):
+    # Con frames de duración irregular (más cortos y más largos que dt) el reloj de paso fijo debe
+    # seguir al tiempo real, y la interpolación debe coincidir con el estado anterior a los pasos
+    # del frame (alfa = 0 es ese estado) aunque haya emisiones y muertes entre medio
+    sim = TornadoEngine(seed=0, particles_per_second=200, particle_lifetime=0.5, radio_dominio=0.9)
+    sim.spawn(1000)
+    reloj = SimulationClock(sim, dt)
+    rng = np.random.default_rng(0)
+    ahora = 0.0
+    reloj.avanzar(ahora)
+    error = 0.0
+    for _ in range(frames):
+        ahora += rng.uniform(0.2, 3) * dt
+        x, y, ids = sim.x.copy(), sim.y.copy(), sim.ids.copy()
+        if reloj.avanzar(ahora) == 1:
+            visible = reloj.visible()
+            indices = sim.indices(ids)
+            vivos = indices >= 0
+            for anterior, actual, mostrado in ((x, sim.x, visible.x), (y, sim.y, visible.y)):
+                esperado = anterior[vivos] + reloj.alfa * (actual[indices[vivos]] - anterior[vivos])
+                error = max(error, np.abs(mostrado[indices[vivos]] - esperado).max(initial=0))
+    # Lo dibujado va exactamente un paso detrás del tiempo real: se interpola hacia el último estado
+    desfase = abs(reloj.reloj_visible + dt - ahora)
+    ok = desfase < 1e-9 and error < 1e-9
+    print(f'Reloj de paso fijo tras {frames} frames: desfase {desfase:.2e} s, error de interpolación '
+          f'{error:.1e}, {reloj.tasa():.3f} s/s {"OK" if ok else "FALLA"}')
+    return ok
+
+
+def validar_ids(pasos=600):
+    # buscar() contra un diccionario de ids vivos, con emisiones, expiraciones con tiempos de vida
+    # que se acortan (el orden FIFO se pierde) y eliminaciones sueltas (swap-remove) o masivas
+    # (compactación), que son los caminos que mueven partículas y reconstruyen el mapa de ids
+    rng = np.random.default_rng(0)
+    pool = ParticlePool(('t_muerte',), campo_orden='t_muerte', capacidad=64, campo_id='id')
+    vivos = {}  # id -> tiempo de muerte
+    errores = 0
+    for paso in range(pasos):
+        ahora = float(paso)
+        vida = 40 * (1 - paso / pasos) + 1
+        k = int(rng.integers(0, 40))
+        muertes = ahora + rng.uniform(0, vida, k)
+        pool.agregar(k, t_muerte=muertes)
+        vivos.update(zip(range(pool.siguiente_id - k, pool.siguiente_id), muertes))
+
+        pool.expirar(ahora)
+        vivos = {i: t for i, t in vivos.items() if t > ahora}
+
+        n = len(pool)
+        if n and rng.random() < 0.5:
+            m = int(rng.integers(1, n // 16 + 2)) if rng.random() < 0.7 else n // 4
+            indices = rng.choice(n, min(m, n), replace=False)
+            for i in pool.vista('id')[indices]:
+                vivos.pop(int(i), None)
+            pool.eliminar(indices)
+
+        ids = np.arange(pool.siguiente_id)
+        posiciones = pool.buscar(ids)
+        esperados = np.isin(ids, np.fromiter(vivos, dtype=np.int64, count=len(vivos)))
+        encontrados = posiciones >= 0
+        errores += int(np.count_nonzero(encontrados != esperados))
+        errores += int(np.count_nonzero(pool.vista('id')[posiciones[encontrados]] != ids[encontrados]))
+        errores += len(pool) != len(vivos)
+    print(f'Mapa de ids tras {pasos} pasos ({pool.siguiente_id} ids): {errores} errores '
+          f'{"OK" if errores == 0 else "FALLA"}')
+    return errores == 0
+
+
+def validar_eliminacion(pasos=400):
+    # Cada campo (incluido un atributo registrado de otro dtype) debe seguir alineado con su id
+    # después de muertes sueltas (swap-remove), masivas (compactación con máscara), expiraciones
+    # fuera de orden y crecimientos del buffer; se verifica que los tres caminos se recorran
+    rng = np.random.default_rng(1)
+    pool = ParticlePool(('x', 'y', 't_muerte'), campo_orden='t_muerte', capacidad=64, campo_id='id')
+    pool.registrar('tipo', np.int32, -1)
+    esperado = {}  # id -> (x, y, t_muerte, tipo)
+    caminos = {'swap': 0, 'mascara': 0, 'crecimiento': 0}
+    errores = 0
+    for paso in range(pasos):
+        ahora = float(paso)
+        k = int(rng.integers(0, 60))
+        valores = {'x': rng.random(k), 'y': rng.random(k), 't_muerte': ahora + rng.uniform(0, 30, k),
+                   'tipo': rng.integers(0, 1000, k).astype(np.int32)}
+        capacidad = pool.capacidad
+        pool.agregar(k, **valores)
+        caminos['crecimiento'] += pool.capacidad != capacidad
+        ids = range(pool.siguiente_id - k, pool.siguiente_id)
+        esperado.update(zip(ids, zip(valores['x'], valores['y'], valores['t_muerte'], valores['tipo'])))
+
+        pool.expirar(ahora)
+        esperado = {i: v for i, v in esperado.items() if v[2] > ahora}
+
+        n = len(pool)
+        if n and rng.random() < 0.6:
+            m = int(rng.integers(1, n // 16 + 2)) if rng.random() < 0.6 else int(rng.integers(n // 8 + 1, n + 1))
+            indices = rng.choice(n, min(m, n), replace=False)
+            caminos['mascara' if len(indices) * FRACCION_COMPACTACION > n else 'swap'] += 1
+            for i in pool.vista('id')[indices]:
+                esperado.pop(int(i), None)
+            pool.eliminar(indices)
+
+        ids = pool.vista('id')
+        errores += len(pool) != len(esperado) or set(ids.tolist()) != esperado.keys()
+        if len(ids):
+            referencia = np.array([esperado.get(int(i), (np.nan,) * 4) for i in ids])
+            for columna, campo in enumerate(('x', 'y', 't_muerte', 'tipo')):
+                errores += int(np.count_nonzero(pool.vista(campo) != referencia[:, columna]))
+    ok = errores == 0 and all(caminos.values())
+    print(f'Eliminación tras {pasos} pasos (swap-remove {caminos["swap"]}, máscara {caminos["mascara"]}, '
+          f'crecimientos {caminos["crecimiento"]}): {errores} errores {"OK" if ok else "FALLA"}')
+    return ok
+
+
+def validar_reanudacion(pasos=150, continuacion=150):
+    # Una corrida guardada con Checkpointer y recargada con cargar debe continuar idéntica bit a
+    # bit a la original, en cada núcleo y en float32. Con radio_dominio las partículas que salen
+    # mueren con swap-remove, así que se guarda también un pool sin orden FIFO
+    ok = True
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nucleo in NUCLEOS:
+            for dtype in (np.float64, np.float32):
+                sim = TornadoEngine(seed=0, particles_per_second=500, particle_lifetime=2.0, max_velocidad=0.05,
+                                    radio_dominio=0.8, dtype=dtype, nucleo=nucleo)
+                sim.registrar_atributo('temperatura', defecto=20.0)
+                sim.spawn(2000, temperatura=np.linspace(0, 1, 2000))
+                sim.run(pasos)
+                ordenado = sim.pool.ordenado
+                ruta = os.path.join(carpeta, f'{nucleo}_{np.dtype(dtype).name}.npz')
+                Checkpointer(sim, ruta, cada=0).cerrar()
+                copia = cargar(ruta)
+                sim.run(continuacion)
+                copia.run(continuacion)
+                iguales = (sim.frame_count == copia.frame_count and sim.pool.campos == copia.pool.campos
+                           and all(np.array_equal(sim.pool.vista(campo), copia.pool.vista(campo))
+                                   for campo in sim.pool.campos))
+                ok &= iguales
+                print(f'Reanudación {nucleo} {np.dtype(dtype).name} ({len(sim)} partículas, pool '
+                      f'{"ordenado" if ordenado else "sin orden"} al guardar) tras {continuacion} pasos: '
+                      f'{"OK" if iguales else "FALLA"}')
+    return ok
+
+
+def validar_todo():
+    # Todas las variantes del núcleo se comparan contra NumPy en float64
+    referencia = {'nucleo': 'numpy', 'dtype': np.float64}
+    ok = validar_emision()
+    ok &= validar_reloj()
+    ok &= validar_ids()
+    ok &= validar_eliminacion()
+    ok &= validar_reanudacion()
+    ok &= validar('float32 vs float64', referencia, {'nucleo': 'numpy', 'dtype': np.float32}, 1e-3)
+    # Repartir la población en tramos por hilo y bloques de caché no debe cambiar ni un bit
+    for nucleo in NUCLEOS:
+        ok &= validar(f'{nucleo} hilos=4 vs 1', {'nucleo': nucleo, 'hilos': 1},
+                      {'nucleo': nucleo, 'hilos': 4, 'tamano_bloque': 4096}, 0.0, pasos=200)
+    for nucleo in NUCLEOS:
+        if nucleo != 'numpy':
+            ok &= validar(f'{nucleo} vs numpy', referencia, {'nucleo': nucleo, 'dtype': np.float64}, 1e-9)
+            ok &= validar(f'{nucleo} float32 vs numpy float64', referencia, {'nucleo': nucleo, 'dtype': np.float32}, 1e-3)
+    # Cada integrador (con y sin subpasos) debe dar lo mismo en todos los núcleos
+    for integrador in INTEGRADORES:
+        for angulo in (None, 0.05):
+            opciones = {'integrador': integrador, 'angulo_maximo': angulo}
+            for nucleo in NUCLEOS:
+                if nucleo != 'numpy':
+                    ok &= validar(f'{nucleo} vs numpy ({integrador}, subpasos {angulo})', {'nucleo': 'numpy', **opciones},
+                                  {'nucleo': nucleo, **opciones}, 1e-9, pasos=200)
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks del motor y validaciones de sus resultados')
+    parser.add_argument('--validar', action='store_true',
+                        help='Solo las validaciones, sin los benchmarks (sale con código 1 si alguna falla)')
+    args = parser.parse_args()
+    if not args.validar:
+        benchmark_emision()
+        for nucleo in NUCLEOS:
+            for dtype in (np.float64, np.float32):
+                print()
+                benchmark_paso(dtype=dtype, nucleo=nucleo)
+        print()
+        benchmark_hilos(n=10**6)
+        print()
+        benchmark_eliminacion()
+        print()
+        benchmark_atributos()
+        print()
+        benchmark_integradores()
+        print()
+    if not validar_todo():
+        raise SystemExit(1)
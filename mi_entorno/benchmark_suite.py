@@ -0,0 +1,288 @@
+"""Suite de benchmarks por fase del simulador de tornados (backend Agg).
+
+Mide, para cada tamaño de población, el costo por frame de cada fase: emisión, expiración por
+tiempo de vida, núcleo de velocidad, offsets/colores del scatter y dibujo. Compara la
+implementación original de mi_entorno (reproducida en benchmark.py) con el motor actual, este con
+el renderizador raster (partículas acumuladas en una imagen en lugar del scatter), y las demás
+versiones del simulador del repositorio (entorno/tornado_simulator.py, mejorado.py, mejorado2.0.py
+y nuevo.py), cargadas desde sus archivos. En esas versiones update() hace varias fases a la vez:
+su tiempo completo se informa como núcleo y las fases que no pueden separarse quedan en null.
+Eduardo.py no se mide (ver SIN_MEDIR).
+
+Ejemplos:
+    python benchmark_suite.py --sizes 1e3 1e4 1e5 1e6 --out resultados.json
+    python benchmark_suite.py --baseline resultados.json --umbral 0.2
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import re
+import statistics
+import time
+import warnings
+from types import SimpleNamespace
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from benchmark import add_particle_original, paso_original
+from particle_render import RasterRenderer, ScatterRenderer
+from tornado_engine import TornadoEngine, FPS_REFERENCIA
+
+# Con 5 s de vida a 50 FPS, en régimen estacionario se emite y expira N / 250 partículas por frame
+TIEMPO_DE_VIDA = 5.0
+FASES = ('emision', 'expiracion', 'nucleo', 'offsets_colores', 'dibujo')
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Versiones del repositorio que no pueden medirse con este backend, con el motivo
+SIN_MEDIR = {
+    'Eduardo.py': 'usa tkinter: cada partícula es un ítem de un tk.Canvas que se mueve con canvas.move y '
+                  'root.update(); necesita una pantalla y no dibuja con matplotlib, así que no hay backend Agg',
+}
+
+
+def medir_fase(funcion, preparar=None, tiempo_min=0.2, max_repeticiones=50):
+    # Mediana del tiempo por llamada; preparar() se ejecuta antes de cada llamada sin medirse
+    tiempos = []
+    total = 0.0
+    while total < tiempo_min and len(tiempos) < max_repeticiones:
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+        total += tiempos[-1]
+    return statistics.median(tiempos)
+
+
+def figura_agg():
+    fig, ax = plt.subplots(figsize=(14, 10))
+    ax.set_xlim(-102, -98)
+    ax.set_ylim(33, 37)
+    return fig, ax
+
+
+def motor_estacionario(n, rng):
+    # Población de n partículas con tiempos de muerte escalonados, como en régimen estacionario
+    engine = TornadoEngine(seed=rng, particles_per_second=0, particle_lifetime=TIEMPO_DE_VIDA)
+    engine.spawn(n)
+    engine.pool.vista('t_muerte')[:] = np.linspace(0, TIEMPO_DE_VIDA, n)
+    engine.step()
+    return engine
+
+
+def medir_motor(n, rng, renderer=ScatterRenderer):
+    engine = motor_estacionario(n, rng)
+    cuota = max(1, n // int(TIEMPO_DE_VIDA * FPS_REFERENCIA))
+    resultados = {}
+
+    resultados['emision'] = medir_fase(lambda: engine.spawn(cuota))
+
+    def avanzar_reloj():
+        engine.reloj += 1 / FPS_REFERENCIA
+    resultados['expiracion'] = medir_fase(engine.cull, preparar=avanzar_reloj)
+
+    engine = motor_estacionario(n, rng)
+    resultados['nucleo'] = medir_fase(lambda: engine._paso_fisico(engine.x, engine.y, engine.vx, engine.vy,
+                                                                   engine.dist, 1.0))
+
+    fig, ax = figura_agg()
+    renderer = renderer(ax, engine)
+    resultados['offsets_colores'] = medir_fase(lambda: renderer.actualizar(engine))
+    resultados['dibujo'] = medir_fase(fig.canvas.draw, max_repeticiones=10)
+    plt.close(fig)
+    engine.close()
+    return resultados
+
+
+def medir_original(n, rng):
+    # Mismas fases con el código original: np.append, máscara sobre cinco arreglos, temporales
+    x, y = rng.uniform(-1, 1, n), rng.uniform(-1, 1, n)
+    vx, vy = np.zeros(n), np.zeros(n)
+    life_time = np.linspace(0, TIEMPO_DE_VIDA, n)
+    cuota = max(1, n // int(TIEMPO_DE_VIDA * FPS_REFERENCIA))
+    resultados = {}
+
+    # Cada np.append copia los N elementos: se miden pocas partículas y se extrapola a la cuota
+    sim = TornadoEngine(particles_per_second=min(cuota, 20))
+    t = medir_fase(lambda: add_particle_original(sim, x, y, vx, vy, life_time), max_repeticiones=5)
+    resultados['emision'] = t * cuota / sim.particles_per_second
+
+    def expirar():
+        vivos = life_time - 1 / FPS_REFERENCIA
+        mask = vivos > 0
+        return x[mask], y[mask], vx[mask], vy[mask], vivos[mask]
+    resultados['expiracion'] = medir_fase(expirar)
+
+    dist = paso_original(x.copy(), y.copy(), vx, vy, 1.0, 1.0, 0.01)
+    resultados['nucleo'] = medir_fase(lambda: paso_original(x.copy(), y.copy(), vx, vy, 1.0, 1.0, 0.01))
+
+    fig, ax = figura_agg()
+    particulas = ax.scatter(-100 + x, 35 + y, c='blue')
+
+    def offsets_colores():
+        particulas.set_offsets(np.c_[-100 + x, 35 + y])
+        particulas.set_color(plt.cm.coolwarm(1 - dist / 1.0))
+    resultados['offsets_colores'] = medir_fase(offsets_colores)
+    offsets_colores()
+    resultados['dibujo'] = medir_fase(fig.canvas.draw, max_repeticiones=10)
+    plt.close(fig)
+    return resultados
+
+
+def medir_raster(n, rng):
+    # El motor con las partículas acumuladas en una imagen en lugar del scatter
+    return medir_motor(n, rng, renderer=RasterRenderer)
+
+
+_scripts = {}
+
+
+def cargar_script(ruta):
+    # Importa una versión del simulador desde su archivo (mejorado2.0.py no es un nombre de módulo
+    # válido). Las que arrancan la animación al importarse lo hacen contra Agg, donde plt.show()
+    # no hace nada; sus figuras se cierran enseguida
+    if ruta not in _scripts:
+        especificacion = importlib.util.spec_from_file_location('suite_' + re.sub(r'\W', '_', ruta),
+                                                                os.path.join(RAIZ, ruta))
+        modulo = importlib.util.module_from_spec(especificacion)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # La animación se descarta sin haberse dibujado
+            especificacion.loader.exec_module(modulo)
+        plt.close('all')
+        _scripts[ruta] = modulo
+    return _scripts[ruta]
+
+
+def medir_entorno(n, rng):
+    # entorno/tornado_simulator.py: np.append por partícula como el original, pero expiración,
+    # física y colores ocurren dentro de update(). Se crea sin __init__ (mapa de cartopy y widgets)
+    # y dibuja sobre los mismos ejes Agg que las demás implementaciones
+    clase = cargar_script('entorno/tornado_simulator.py').TornadoSimulator
+    sim = clase.__new__(clase)
+    sim.radius_max = 1.0
+    sim.lon_center, sim.lat_center = -100, 35
+    sim.particle_lifetime = TIEMPO_DE_VIDA
+    sim.slider_velocity_bar = SimpleNamespace(val=0.01)
+    estado = (rng.uniform(-1, 1, n), rng.uniform(-1, 1, n), np.zeros(n), np.zeros(n),
+              np.linspace(0, TIEMPO_DE_VIDA, n))
+
+    def restaurar():
+        # Misma población en cada medición; con frame_count = 0 y 1 partícula/s, update no emite
+        sim.x, sim.y, sim.vx, sim.vy, sim.life_time = (campo.copy() for campo in estado)
+        sim.frame_count = 0
+        sim.particles_per_second = 1
+
+    resultados = {'expiracion': None, 'offsets_colores': None}
+    cuota = max(1, n // int(TIEMPO_DE_VIDA * FPS_REFERENCIA))
+    restaurar()
+    sim.particles_per_second = min(cuota, 20)
+    t = medir_fase(sim.add_particle, max_repeticiones=5)
+    resultados['emision'] = t * cuota / sim.particles_per_second
+
+    fig, ax = figura_agg()
+    sim.particulas = ax.scatter(sim.lon_center + estado[0], sim.lat_center + estado[1], c='blue')
+    resultados['nucleo'] = medir_fase(lambda: sim.update(0), preparar=restaurar)
+    resultados['dibujo'] = medir_fase(fig.canvas.draw, max_repeticiones=10)
+    plt.close(fig)
+    return resultados
+
+
+def medidor_script(ruta):
+    # mejorado.py, mejorado2.0.py y nuevo.py: n partículas fijas (sin emisión ni expiración) que
+    # update() mueve y pasa a la línea con set_data, en sus propios ejes de 800 x 600
+    def medir(n, rng):
+        sim = cargar_script(ruta).TornadoSimulator()
+        sim.num_particulas = n
+        sim.x_particulas = rng.uniform(0, 800, n)
+        sim.y_particulas = rng.uniform(0, 600, n)
+        sim.angles = rng.uniform(0, 2 * np.pi, n)
+        sim.radii = rng.uniform(0, sim.radio, n)
+        resultados = {'emision': None, 'expiracion': None, 'offsets_colores': None}
+        resultados['nucleo'] = medir_fase(lambda: sim.update(0))
+        resultados['dibujo'] = medir_fase(sim.fig.canvas.draw, max_repeticiones=10)
+        plt.close(sim.fig)
+        return resultados
+    return medir
+
+
+IMPLEMENTACIONES = {
+    'original': medir_original,
+    'motor': medir_motor,
+    'raster': medir_raster,
+    'entorno': medir_entorno,
+    'mejorado': medidor_script('mejorado.py'),
+    'mejorado2.0': medidor_script('mejorado2.0.py'),
+    'nuevo': medidor_script('nuevo.py'),
+}
+
+
+def correr_suite(tamanos, implementaciones=tuple(IMPLEMENTACIONES), seed=0):
+    for script, motivo in SIN_MEDIR.items():
+        print(f'{script}: no se mide ({motivo})')
+    resultados = []
+    for nombre in implementaciones:
+        for n in tamanos:
+            tiempos = IMPLEMENTACIONES[nombre](n, np.random.default_rng(seed))
+            for fase in FASES:
+                resultados.append({'implementacion': nombre, 'fase': fase, 'n': n, 'segundos': tiempos[fase]})
+                texto = '-' if tiempos[fase] is None else f'{1e3 * tiempos[fase]:.3f} ms'
+                print(f'{nombre:>11} {fase:>16} {n:>9} {texto:>13}')
+    return {
+        'meta': {
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'matplotlib': matplotlib.__version__,
+            'maquina': platform.machine(),
+            'procesador': platform.processor(),
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(actual, baseline, umbral):
+    # Devuelve las mediciones que empeoraron más que el umbral (0.2 = 20 % más lentas)
+    referencia = {(r['implementacion'], r['fase'], r['n']): r['segundos'] for r in baseline['resultados']}
+    regresiones = []
+    for r in actual['resultados']:
+        clave = (r['implementacion'], r['fase'], r['n'])
+        if r['segundos'] is not None and referencia.get(clave):
+            razon = r['segundos'] / referencia[clave]
+            if razon > 1 + umbral:
+                regresiones.append((clave, referencia[clave], r['segundos'], razon))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5, 1e6],
+                        help='Tamaños de población (hasta 1e7)')
+    parser.add_argument('--impl', nargs='+', choices=tuple(IMPLEMENTACIONES), default=list(IMPLEMENTACIONES))
+    parser.add_argument('--out', default=None, help='Archivo JSON con los resultados')
+    parser.add_argument('--baseline', default=None, help='Resultados JSON previos con los que comparar')
+    parser.add_argument('--umbral', type=float, default=0.2, help='Empeoramiento relativo tolerado')
+    args = parser.parse_args(argv)
+
+    actual = correr_suite([int(n) for n in args.sizes], args.impl)
+    if args.out:
+        with open(args.out, 'w') as archivo:
+            json.dump(actual, archivo, indent=2)
+        print(f'Resultados guardados en {args.out}')
+
+    if args.baseline:
+        with open(args.baseline) as archivo:
+            baseline = json.load(archivo)
+        regresiones = comparar(actual, baseline, args.umbral)
+        for (nombre, fase, n), antes, despues, razon in regresiones:
+            print(f'REGRESIÓN {nombre} {fase} N={n}: {1e3 * antes:.3f} ms -> {1e3 * despues:.3f} ms ({razon:.2f}x)')
+        if regresiones:
+            raise SystemExit(1)
+        print(f'Sin regresiones por encima del {100 * args.umbral:.0f} %')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+
+# Fases medidas en cada frame de la animación
+FASES = ('emision', 'expiracion', 'fisica', 'offsets_colores', 'dibujo')
+
+
+class FrameProfiler:
+    # Mide cada fase del frame envolviendo los métodos correspondientes (atributos de instancia
+    # que tapan al método de la clase). Desactivado no cuesta nada: basta con no instrumentar
+    # o llamar a quitar(), que restaura los métodos originales.
+    def __init__(self, intervalo=50, ventana=300, max_historial=100000):
+        self.intervalo = intervalo  # ms por frame pedidos a FuncAnimation
+        self.ventana = deque(maxlen=ventana)  # Últimos frames, para los percentiles móviles
+        self.historial = deque(maxlen=max_historial)  # Todos los frames, para exportar
+        self._instrumentados = []
+        self._actual = None
+        self._inicio_frame = None
+        self._inicio = time.perf_counter()
+
+    def instrumentar(self, objeto, metodo, fase):
+        original = getattr(objeto, metodo)
+
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                if self._actual is not None:
+                    self._actual[fase] += time.perf_counter() - inicio
+
+        setattr(objeto, metodo, medido)
+        self._instrumentados.append((objeto, metodo))
+
+    def instrumentar_frame(self, objeto, metodo):
+        # El método que inicia cada frame (update de la animación) marca el límite entre frames
+        original = getattr(objeto, metodo)
+
+        def medido(*args, **kwargs):
+            self.nuevo_frame()
+            return original(*args, **kwargs)
+
+        setattr(objeto, metodo, medido)
+        self._instrumentados.append((objeto, metodo))
+
+    def quitar(self):
+        for objeto, metodo in self._instrumentados:
+            delattr(objeto, metodo)
+        self._instrumentados = []
+
+    def nuevo_frame(self):
+        # El dibujo ocurre después de update, así que un frame se cierra al empezar el siguiente
+        ahora = time.perf_counter()
+        if self._actual is not None:
+            self._actual['periodo'] = ahora - self._inicio_frame
+            self._actual['trabajo'] = sum(self._actual[fase] for fase in FASES)
+            self.ventana.append(self._actual)
+            self.historial.append(self._actual)
+        self._actual = dict.fromkeys(FASES, 0.0)
+        self._actual['t'] = ahora - self._inicio
+        self._inicio_frame = ahora
+
+    def estadisticas(self):
+        if not self.ventana:
+            return None
+        periodos = np.array([frame['periodo'] for frame in self.ventana])
+        p50, p95, p99 = np.percentile(periodos, [50, 95, 99])
+        return {
+            'frames': len(self.historial),
+            'p50_ms': 1e3 * p50,
+            'p95_ms': 1e3 * p95,
+            'p99_ms': 1e3 * p99,
+            'fps': 1 / periodos.mean(),
+            'fps_objetivo': 1000 / self.intervalo,
+            'fases_ms': {fase: 1e3 * np.mean([frame[fase] for frame in self.ventana]) for fase in FASES},
+        }
+
+    def texto_hud(self):
+        e = self.estadisticas()
+        if e is None:
+            return ''
+        fases = '  '.join(f'{fase} {ms:.1f}' for fase, ms in e['fases_ms'].items())
+        return (f'FPS {e["fps"]:.1f}/{e["fps_objetivo"]:.0f}   frame p50 {e["p50_ms"]:.1f} '
+                f'p95 {e["p95_ms"]:.1f} p99 {e["p99_ms"]:.1f} ms\n{fases} (ms)')
+
+    def exportar(self, ruta):
+        # CSV con un frame por fila, o JSON con el resumen y los frames, según la extensión
+        columnas = ('t', 'periodo', 'trabajo') + FASES
+        if ruta.endswith('.csv'):
+            with open(ruta, 'w', newline='') as archivo:
+                escritor = csv.DictWriter(archivo, fieldnames=columnas)
+                escritor.writeheader()
+                escritor.writerows(self.historial)
+        else:
+            with open(ruta, 'w') as archivo:
+                json.dump({'resumen': self.estadisticas(), 'frames': list(self.historial)}, archivo, indent=2)
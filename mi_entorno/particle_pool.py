@@ -0,0 +1,204 @@
+import numpy as np
+
+# eliminar() compacta con máscara en lugar de swap-remove cuando muere más de 1/8 de la población
+FRACCION_COMPACTACION = 8
+
+
+class ParticlePool:
+    # Almacén de partículas preasignado: cada campo es un arreglo de capacidad fija y las
+    # partículas vivas ocupan la ventana contigua [head, tail). Las partículas se agregan
+    # por la cola en orden de creación (FIFO), de modo que la expiración por tiempo de vida
+    # solo avanza el índice head en lugar de copiar todos los arreglos en cada frame.
+    #
+    # Con campo_id, cada partícula recibe un identificador de 64 bits creciente y persistente.
+    # Un arreglo denso indexado por id - _base_id guarda la posición de cada id en el buffer;
+    # buscar() verifica que esa posición siga viva y contenga el mismo id, así que expirar no
+    # tiene que tocar el mapa: solo se reconstruye cuando los datos se mueven (compactación,
+    # crecimiento o reordenamiento), que ya cuesta O(N).
+    #
+    # Cada campo se declara una vez con su dtype y su valor por defecto (en el constructor o
+    # con registrar); agregar, expirar, eliminar y las copias al crecer recorren todos los campos
+    # por igual, así que un atributo nuevo no necesita código propio en ninguno de esos caminos.
+    def __init__(self, campos, campo_orden, capacidad=1024, dtype=np.float64, dtypes=None, campo_id=None,
+                 defectos=None):
+        self.campos = tuple(campos)
+        self.campo_orden = campo_orden  # Campo que crece con el orden de creación (tiempo de muerte)
+        self.campo_id = campo_id
+        if campo_id is not None and campo_id not in self.campos:
+            self.campos = (campo_id,) + self.campos
+        # dtype común a todos los campos, salvo los que se indiquen en dtypes
+        self.dtype = np.dtype(dtype)
+        self.dtypes = {campo: self.dtype for campo in self.campos}
+        self.dtypes.update({campo: np.dtype(valor) for campo, valor in (dtypes or {}).items()})
+        if campo_id is not None:
+            self.dtypes[campo_id] = np.dtype(np.int64)
+        # Valor de cada campo para las partículas que se agregan sin indicarlo
+        self.defectos = dict.fromkeys(self.campos, 0)
+        self.defectos.update(defectos or {})
+        self.siguiente_id = 0
+        self._base_id = 0
+        self._posiciones = np.full(capacidad, -1, dtype=np.int64)
+        self.capacidad_inicial = capacidad
+        self.capacidad = capacidad
+        self.head = 0
+        self.tail = 0
+        self.ordenado = True  # False si el campo de orden dejó de ser creciente
+        self._datos = {campo: np.empty(capacidad, dtype=self.dtypes[campo]) for campo in self.campos}
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def vista(self, campo):
+        # Vista (sin copia) de las partículas vivas de un campo
+        return self._datos[campo][self.head:self.tail]
+
+    def registrar(self, campo, dtype=None, defecto=0):
+        # Agrega un campo a todas las partículas; las que ya están vivas toman el valor por defecto
+        if campo in self._datos:
+            raise ValueError(f'El campo {campo!r} ya existe')
+        dtype = np.dtype(dtype) if dtype is not None else self.dtype
+        datos = np.empty(self.capacidad, dtype=dtype)
+        datos[self.head:self.tail] = defecto
+        self.campos += (campo,)
+        self.dtypes[campo] = dtype
+        self.defectos[campo] = defecto
+        self._datos[campo] = datos
+
+    def agregar(self, n, **valores):
+        # Agrega n partículas; cada valor puede ser un escalar o un arreglo de longitud n, y los
+        # campos que no se pasan toman su valor por defecto (una asignación escalar, sin arreglos
+        # temporales). Los ids se asignan solos, salvo que se pasen explícitamente (al restaurar
+        # un checkpoint)
+        if n <= 0:
+            return
+        desconocidos = valores.keys() - self._datos.keys()
+        if desconocidos:
+            raise ValueError(f'Campos no registrados: {", ".join(sorted(desconocidos))}')
+        self._asegurar_espacio(n)
+        inicio, fin = self.tail, self.tail + n
+        if self.campo_id is not None and self.campo_id not in valores:
+            valores[self.campo_id] = np.arange(self.siguiente_id, self.siguiente_id + n)
+        for campo in self.campos:
+            self._datos[campo][inicio:fin] = valores[campo] if campo in valores else self.defectos[campo]
+        if self.campo_id is not None:
+            ids = self._datos[self.campo_id][inicio:fin]
+            self.siguiente_id = max(self.siguiente_id, int(ids.max()) + 1)
+            if int(ids.min()) < self._base_id or self.siguiente_id - self._base_id > self._posiciones.size:
+                self.tail = fin
+                self._reconstruir_posiciones()
+            else:
+                self._posiciones[ids - self._base_id] = np.arange(inicio, fin)
+
+        nuevos = self._datos[self.campo_orden][inicio:fin]
+        if self.ordenado:
+            if inicio > self.head and nuevos[0] < self._datos[self.campo_orden][inicio - 1]:
+                self.ordenado = False
+            elif n > 1 and np.any(nuevos[1:] < nuevos[:-1]):
+                self.ordenado = False
+        self.tail = fin
+
+    def buscar(self, ids):
+        # Índices en la vista de las partículas con esos ids (-1 si ya no existen), en O(1) por id
+        ids = np.asarray(ids, dtype=np.int64)
+        relativos = ids - self._base_id
+        dentro = (relativos >= 0) & (relativos < self._posiciones.size)
+        posiciones = np.full(ids.shape, -1, dtype=np.int64)
+        posiciones[dentro] = self._posiciones[relativos[dentro]]
+        vivos = (posiciones >= self.head) & (posiciones < self.tail)
+        vivos[vivos] = self._datos[self.campo_id][posiciones[vivos]] == ids[vivos]
+        return np.where(vivos, posiciones - self.head, -1)
+
+    def _reconstruir_posiciones(self):
+        # El mapa cubre desde el id vivo más antiguo hasta el siguiente a asignar, con holgura
+        # para que agregar no lo reconstruya en cada emisión
+        if self.campo_id is None:
+            return
+        ids = self.vista(self.campo_id)
+        self._base_id = int(ids.min()) if ids.size else self.siguiente_id
+        tamano = max(self.capacidad, 2 * (self.siguiente_id - self._base_id))
+        if self._posiciones.size != tamano:
+            self._posiciones = np.empty(tamano, dtype=np.int64)
+        self._posiciones.fill(-1)
+        self._posiciones[ids - self._base_id] = np.arange(self.head, self.tail)
+
+    def expirar(self, limite):
+        # Elimina las partículas cuyo campo de orden es <= limite. En orden FIFO basta avanzar
+        # head; si el orden se perdió (se redujo el tiempo de vida o se eliminaron partículas
+        # sueltas) se buscan las vencidas y se quitan con swap-remove, sin ordenar
+        if self.ordenado:
+            self.head += int(np.searchsorted(self.vista(self.campo_orden), limite, side='right'))
+            if self.head == self.tail:
+                self.head = self.tail = 0
+        else:
+            self.eliminar(np.flatnonzero(self.vista(self.campo_orden) <= limite))
+
+    def eliminar(self, indices):
+        # Elimina partículas en posiciones arbitrarias de la vista. Con pocas muertes se usa
+        # swap-remove: los huecos que quedan antes del nuevo final se llenan con las últimas
+        # partículas vivas, en todos los campos a la vez, con costo proporcional a las muertes.
+        # Si muere una fracción grande, una compactación con máscara (que conserva el orden) es
+        # más barata que mover partícula por partícula
+        muertos = np.unique(np.asarray(indices, dtype=np.intp))
+        k = muertos.size
+        n = len(self)
+        if k == 0:
+            return
+        if k * FRACCION_COMPACTACION > n:
+            vivos = np.ones(n, dtype=bool)
+            vivos[muertos] = False
+            for campo in self.campos:
+                vista = self.vista(campo)
+                vista[:n - k] = vista[vivos]
+            self.tail -= k
+            self._reconstruir_posiciones()
+        else:
+            corte = n - k
+            huecos = muertos[muertos < corte]
+            libres = np.ones(k, dtype=bool)
+            libres[muertos[muertos >= corte] - corte] = False
+            movidas = corte + np.flatnonzero(libres)
+            if huecos.size:
+                destino, origen = self.head + huecos, self.head + movidas
+                for campo in self.campos:
+                    datos = self._datos[campo]
+                    datos[destino] = datos[origen]
+                if self.campo_id is not None:
+                    self._posiciones[self._datos[self.campo_id][destino] - self._base_id] = destino
+                self.ordenado = False
+            self.tail -= k
+        if self.head == self.tail:
+            self.head = self.tail = 0
+            self.ordenado = True
+
+    def _asegurar_espacio(self, n):
+        if self.tail + n <= self.capacidad:
+            return
+
+        vivos = len(self)
+        capacidad = self.capacidad
+        # Crecimiento geométrico cuando no alcanza; reducción si quedó muy holgado
+        while vivos + n > capacidad * 3 // 4:
+            capacidad *= 2
+        while capacidad > self.capacidad_inicial and vivos + n < capacidad // 8:
+            capacidad //= 2
+
+        # Los datos se copian de todos modos: si el orden FIFO se había perdido, se restablece en
+        # la misma copia y expirar vuelve a ser solo avanzar head
+        orden = None if self.ordenado else np.argsort(self.vista(self.campo_orden), kind='stable')
+        if capacidad == self.capacidad:
+            # Hay espacio de sobra: se compacta la ventana al inicio del buffer
+            for campo in self.campos:
+                datos = self._datos[campo]
+                datos[:vivos] = datos[self.head:self.tail] if orden is None else datos[self.head:self.tail][orden]
+        else:
+            for campo in self.campos:
+                nuevo = np.empty(capacidad, dtype=self.dtypes[campo])
+                vista = self._datos[campo][self.head:self.tail]
+                nuevo[:vivos] = vista if orden is None else vista[orden]
+                self._datos[campo] = nuevo
+            self.capacidad = capacidad
+
+        self.ordenado = True
+        self.head = 0
+        self.tail = vivos
+        self._reconstruir_posiciones()
@@ -0,0 +1,142 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+
+# Más azul lejos del centro, más rojo cerca: coolwarm invertido sobre la distancia al centro
+MAPA_COLORES = 'coolwarm_r'
+
+
+def rango_color(engine, color, rango):
+    # (vmin, vmax) del campo con que se colorea: el indicado, (0, radius_max) para la distancia o,
+    # para otro atributo, el mínimo y máximo de sus valores actuales
+    if rango is not None:
+        return rango
+    if color == 'dist':
+        return 0.0, engine.radius_max
+    valores = getattr(engine, color)
+    if valores.size == 0:
+        return 0.0, 1.0
+    vmin, vmax = float(valores.min()), float(valores.max())
+    return vmin, vmax if vmax > vmin else vmin + 1
+
+
+class ScatterRenderer:
+    # Dibuja las partículas del motor como un scatter de matplotlib. Se separa de la vista para
+    # poder medir y reemplazar el dibujo sin construir el mapa ni los widgets
+    def __init__(self, ax, engine, cmap=MAPA_COLORES, color='dist', rango=None, **kwargs):
+        # El color es un escalar por partícula (la distancia u otro atributo registrado del motor)
+        # con una norma fija: matplotlib lo pasa por la tabla del mapa de colores una sola vez, al
+        # dibujar. Sin rango, la distancia sigue a radius_max y otro atributo fija su rango al inicio
+        self.color = color
+        self.rango = rango if rango is not None or color == 'dist' else rango_color(engine, color, rango)
+        self.norma = Normalize(*rango_color(engine, color, self.rango))
+        self.particulas = ax.scatter(engine.lon_center + engine.x, engine.lat_center + engine.y,
+                                     c=getattr(engine, color), cmap=cmap, norm=self.norma, **kwargs)
+
+    def actualizar(self, engine):
+        self.particulas.set_offsets(np.c_[engine.lon_center + engine.x, engine.lat_center + engine.y])
+        vmin, vmax = rango_color(engine, self.color, self.rango)
+        if (self.norma.vmin, self.norma.vmax) != (vmin, vmax):
+            self.norma.vmin, self.norma.vmax = vmin, vmax
+        self.particulas.set_array(getattr(engine, self.color))
+        return self.particulas,
+
+
+def _caja(plano, tamano, eje):
+    # Suma móvil de `tamano` píxeles a lo largo de un eje, sin envolver en los bordes
+    entrada = np.swapaxes(plano, 0, eje)
+    suma = np.zeros_like(entrada)
+    n = entrada.shape[0]
+    for desplazamiento in range(-(tamano // 2), tamano - tamano // 2):
+        if desplazamiento >= 0:
+            suma[desplazamiento:] += entrada[:n - desplazamiento]
+        else:
+            suma[:desplazamiento] += entrada[-desplazamiento:]
+    return np.swapaxes(suma, 0, eje)
+
+
+class RasterRenderer:
+    # Acumula las partículas con NumPy en una imagen RGBA preasignada y la muestra con un único
+    # imshow que se actualiza en el lugar. Por píxel se cuentan las partículas y se suman sus
+    # distancias (o el atributo de color): la opacidad se acumula (mezcla aditiva) y el color
+    # sale del valor medio.
+    # Ambos se leen de tablas uint8 precalculadas, vistas como uint32 para escribir cada píxel
+    # RGBA de una vez. El costo es O(N + píxeles), sin un artista ni una ruta por partícula como
+    # en el scatter.
+    def __init__(self, ax, engine, tamano_punto=1, alfa=0.5, cmap=MAPA_COLORES, resolucion=None, color='dist',
+                 rango=None, **kwargs):
+        self.ax = ax
+        self.color = color
+        self.rango = rango if rango is not None or color == 'dist' else rango_color(engine, color, rango)
+        self.tamano_punto = tamano_punto
+        self.alfa = alfa
+
+        # Tablas RGBA uint8 (el color sin alfa y el alfa sin color) para combinarlas con un OR
+        colores = plt.get_cmap(cmap)(np.linspace(0, 1, 256), bytes=True)
+        colores[:, 3] = 0
+        self._tabla_color = colores.view(np.uint32).ravel()
+        self._saturacion = int(np.ceil(1 / alfa))  # Partículas por píxel con opacidad máxima
+        opacidades = np.zeros((self._saturacion + 1, 4), dtype=np.uint8)
+        opacidades[:, 3] = np.minimum(np.arange(self._saturacion + 1) * (255 * alfa), 255)
+        self._tabla_opacidad = opacidades.view(np.uint32).ravel()
+        if resolucion is None:
+            # Un píxel de la imagen por píxel de pantalla del eje
+            ax.apply_aspect()
+            posicion = ax.get_position()
+            ancho, alto = ax.figure.get_size_inches() * ax.figure.dpi
+            resolucion = (max(1, round(posicion.width * ancho)), max(1, round(posicion.height * alto)))
+        self.ancho, self.alto = resolucion
+        self.imagen = np.zeros((self.alto, self.ancho, 4), dtype=np.uint8)
+
+        self.limites = self._limites_eje()
+        self.particulas = ax.imshow(self.imagen, extent=self.limites, origin='lower', interpolation='nearest',
+                                    aspect=ax.get_aspect(), zorder=2, **kwargs)
+        # imshow ajusta los límites a la imagen: se restauran los del eje
+        ax.set_xlim(self.limites[:2])
+        ax.set_ylim(self.limites[2:])
+        self.actualizar(engine)
+
+    def _limites_eje(self):
+        return (*self.ax.get_xlim(), *self.ax.get_ylim())
+
+    def actualizar(self, engine):
+        # Si el eje cambió (zoom, desplazamiento), la imagen pasa a cubrir los nuevos límites
+        limites = self._limites_eje()
+        if limites != self.limites:
+            self.limites = limites
+            self.particulas.set_extent(limites)
+        x0, x1, y0, y1 = limites
+
+        # Índices en una grilla con un borde de un píxel: lo que cae fuera del eje se acumula en
+        # el borde y se descarta, sin máscaras booleanas sobre los N elementos
+        ancho, alto = self.ancho + 2, self.alto + 2
+        columnas = (engine.lon_center - x0 + engine.x) * (self.ancho / (x1 - x0)) + 1
+        filas = (engine.lat_center - y0 + engine.y) * (self.alto / (y1 - y0)) + 1
+        np.clip(columnas, 0, ancho - 1, out=columnas)
+        np.clip(filas, 0, alto - 1, out=filas)
+        indices = filas.astype(np.intp) * ancho + columnas.astype(np.intp)
+
+        cuenta = np.bincount(indices, minlength=alto * ancho).reshape(alto, ancho)[1:-1, 1:-1]
+        suma = np.bincount(indices, weights=getattr(engine, self.color),
+                           minlength=alto * ancho).reshape(alto, ancho)[1:-1, 1:-1]
+        if self.tamano_punto > 1:
+            cuenta = _caja(_caja(cuenta, self.tamano_punto, 0), self.tamano_punto, 1)
+            suma = _caja(_caja(suma, self.tamano_punto, 0), self.tamano_punto, 1)
+
+        # Valor medio por píxel -> índice en la tabla de colores (los píxeles vacíos quedan en 0)
+        vmin, vmax = rango_color(engine, self.color, self.rango)
+        if vmin != 0:
+            suma -= vmin * cuenta
+        nivel = suma * (255 / (vmax - vmin))
+        nivel /= np.maximum(cuenta, 1)
+        np.clip(nivel, 0, 255, out=nivel)
+
+        # Mezcla aditiva: cada partícula suma alfa a la opacidad del píxel, saturada en 255
+        np.minimum(cuenta, self._saturacion, out=cuenta)
+        np.bitwise_or(self._tabla_color[nivel.astype(np.intp)], self._tabla_opacidad[cuenta.astype(np.intp)],
+                      out=self.imagen.view(np.uint32)[..., 0])
+        self.particulas.set_data(self.imagen)
+        return self.particulas,
+
+
+RENDERERS = {'scatter': ScatterRenderer, 'raster': RasterRenderer}
@@ -0,0 +1,106 @@
+import time
+from collections import deque
+import numpy as np
+from tornado_engine import FPS_REFERENCIA
+
+
+class SimulationClock:
+    # Reloj de paso fijo que desacopla la simulación del ritmo de dibujo. Cada frame mide el tiempo
+    # real transcurrido, lo acumula (por escala) y avanza el motor en pasos de dt fijo: varios por
+    # frame si el dibujo es lento, ninguno si es más rápido que dt. La física no depende de los FPS.
+    # Lo que sobra (menos de un paso) queda en alfa, la fracción del paso siguiente ya transcurrida,
+    # y visible() devuelve las posiciones interpoladas entre los dos últimos estados del motor.
+    # Si un frame necesitaría más de max_pasos pasos (la física no da abasto), el tiempo de más se
+    # descarta en lugar de acumularse: la simulación va más lenta que el tiempo real, y tasa()
+    # informa cuántos segundos simulados avanza por segundo real.
+    def __init__(self, engine, dt=1 / FPS_REFERENCIA, escala=1.0, max_pasos=8, interpolar=True,
+                 despues_del_paso=None, ventana=50):
+        self.engine = engine
+        self.dt = dt
+        self.escala = escala  # Segundos simulados por segundo real pedidos
+        self.max_pasos = max_pasos
+        self.interpolar = interpolar
+        self.despues_del_paso = despues_del_paso  # Se llama tras cada paso (checkpoints, grabación)
+        self.acumulado = 0.0
+        self.alfa = 0.0
+        self.descartado = 0.0  # Tiempo simulado perdido por no alcanzar el tiempo real
+        self.pasos_frame = 0
+        self._ultimo = None
+        self._muestras = deque(maxlen=ventana)  # (tiempo real, reloj del motor) por frame
+        self._pasos_ultimo = None  # dt * FPS del último paso; None si no hay estado anterior
+        self._visible = _Interpolado(engine)
+
+    def avanzar(self, ahora=None):
+        # Avanza el motor lo que corresponde al tiempo real desde la llamada anterior; devuelve
+        # el número de pasos ejecutados
+        ahora = time.perf_counter() if ahora is None else ahora
+        if self._ultimo is not None:
+            self.acumulado += (ahora - self._ultimo) * self.escala
+        self._ultimo = ahora
+
+        pasos = int(self.acumulado / self.dt)
+        if pasos > self.max_pasos:
+            self.descartado += (pasos - self.max_pasos) * self.dt
+            self.acumulado -= (pasos - self.max_pasos) * self.dt
+            pasos = self.max_pasos
+        for _ in range(pasos):
+            self.engine.step(self.dt)
+            self._pasos_ultimo = self.dt * FPS_REFERENCIA
+            if self.despues_del_paso is not None:
+                self.despues_del_paso()
+        self.acumulado -= pasos * self.dt
+        self.alfa = min(max(self.acumulado / self.dt, 0.0), 1.0)
+        self.pasos_frame = pasos
+        self._muestras.append((ahora, self.engine.reloj))
+        return pasos
+
+    def tasa(self):
+        # Segundos simulados por segundo real en los últimos frames (1 = tiempo real a escala 1)
+        if len(self._muestras) < 2:
+            return 0.0
+        (t0, reloj0), (t1, reloj1) = self._muestras[0], self._muestras[-1]
+        return (reloj1 - reloj0) / (t1 - t0) if t1 > t0 else 0.0
+
+    @property
+    def reloj_visible(self):
+        # Tiempo simulado de lo que se dibuja: el del motor menos la parte del paso que falta
+        if not self.interpolar or self._pasos_ultimo is None:
+            return self.engine.reloj
+        return self.engine.reloj - (1 - self.alfa) * self.dt
+
+    def visible(self):
+        # Estado para los renderers: el motor mismo, o sus posiciones interpoladas. El núcleo
+        # deja en vx, vy la velocidad con que movió cada partícula en el último paso, así que
+        # el estado anterior es x - vx * pasos, alineado partícula a partícula aunque haya
+        # emisiones, expiraciones o swap-removes de por medio, y sin copiar el estado anterior
+        if not self.interpolar or self._pasos_ultimo is None:
+            return self.engine
+        self._visible.actualizar(-(1 - self.alfa) * self._pasos_ultimo)
+        return self._visible
+
+
+class _Interpolado:
+    # Vista del motor con x, y desplazadas en sus buffers propios (crecen con la población pero no
+    # se reasignan en cada frame); el resto de los atributos se leen del motor
+    def __init__(self, engine):
+        self._engine = engine
+        self._bx = np.empty(0, dtype=engine.dtype)
+        self._by = np.empty(0, dtype=engine.dtype)
+
+    def actualizar(self, factor):
+        engine = self._engine
+        n = len(engine)
+        if n > self._bx.size:
+            self._bx = np.empty(2 * n, dtype=engine.dtype)
+            self._by = np.empty(2 * n, dtype=engine.dtype)
+        self.x, self.y = self._bx[:n], self._by[:n]
+        np.multiply(engine.vx, factor, out=self.x)
+        self.x += engine.x
+        np.multiply(engine.vy, factor, out=self.y)
+        self.y += engine.y
+
+    def __len__(self):
+        return len(self._engine)
+
+    def __getattr__(self, nombre):
+        return getattr(self._engine, nombre)
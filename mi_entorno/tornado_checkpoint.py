@@ -0,0 +1,100 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tornado_engine import TornadoEngine
+
+# Versión del formato: un .npz con un arreglo por campo de partícula y 'meta' (JSON con contadores,
+# parámetros, dtype, núcleo, atributos registrados y estado del generador aleatorio)
+VERSION_FORMATO = 1
+
+
+def guardar_estado(ruta, estado):
+    meta = {
+        'version': VERSION_FORMATO,
+        'frame_count': estado['frame_count'],
+        'reloj': estado['reloj'],
+        'acumulado_emision': estado['acumulado_emision'],
+        'siguiente_id': estado['siguiente_id'],
+        'ordenado': estado['ordenado'],
+        'atributos': estado['atributos'],
+        'parametros': {nombre: valor if valor is None or isinstance(valor, str) else float(valor)
+                       for nombre, valor in estado['parametros'].items()},
+        'dtype': estado['dtype'],
+        'nucleo': estado['nucleo'],
+        'rng': estado['rng'],
+        'campos': list(estado['campos']),
+    }
+    # Se escribe a un temporal y se renombra: un corte a mitad de escritura deja el checkpoint anterior
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as archivo:
+        np.savez(archivo, meta=json.dumps(meta),
+                 **{'campo_' + campo: valores for campo, valores in estado['campos'].items()})
+    os.replace(temporal, ruta)
+
+
+def cargar_estado(ruta):
+    with np.load(ruta) as datos:
+        meta = json.loads(str(datos['meta']))
+        if meta['version'] != VERSION_FORMATO:
+            raise ValueError(f'Versión de checkpoint no soportada: {meta["version"]}')
+        return {
+            'campos': {campo: datos['campo_' + campo] for campo in meta['campos']},
+            'frame_count': meta['frame_count'],
+            'reloj': meta['reloj'],
+            'acumulado_emision': meta.get('acumulado_emision', 0.0),
+            'siguiente_id': meta.get('siguiente_id', 0),
+            'ordenado': meta.get('ordenado', True),
+            'atributos': meta.get('atributos', {}),
+            'parametros': meta['parametros'],
+            'dtype': meta['dtype'],
+            'nucleo': meta.get('nucleo', 'auto'),
+            'rng': meta['rng'],
+        }
+
+
+def cargar(ruta, **opciones):
+    # Motor listo para continuar la corrida guardada en ruta (opciones: hilos, tamano_bloque, nucleo;
+    # sin nucleo se usa el del checkpoint, ver TornadoEngine.restaurar_estado)
+    return TornadoEngine.restaurar_estado(cargar_estado(ruta), **opciones)
+
+
+class Checkpointer:
+    # Guarda el estado del motor cada `cada` frames sin detener el bucle de pasos: en el hilo
+    # del motor solo se copian los arreglos y la escritura a disco ocurre en un hilo aparte.
+    # Si la escritura anterior no terminó, ese checkpoint se omite en lugar de encolarse.
+    # La ruta puede incluir {frame} para conservar un archivo por checkpoint.
+    def __init__(self, engine, ruta, cada=500):
+        self.engine = engine
+        self.ruta = ruta
+        self.cada = cada
+        self.omitidos = 0
+        self._ejecutor = ThreadPoolExecutor(1)
+        self._escritura = None
+        self._cerrado = False
+
+    def tal_vez_guardar(self):
+        if self.cada > 0 and self.engine.frame_count % self.cada == 0:
+            if self._escritura is not None:
+                if not self._escritura.done():
+                    self.omitidos += 1
+                    return
+                self._escritura.result()  # Propaga errores de la escritura anterior
+            self.guardar()
+
+    def guardar(self):
+        estado = self.engine.capturar_estado()
+        ruta = self.ruta.format(frame=estado['frame_count'])
+        self._escritura = self._ejecutor.submit(guardar_estado, ruta, estado)
+        return self._escritura
+
+    def cerrar(self, final=True):
+        # Escribe un último checkpoint (opcional) y espera a que termine todo lo pendiente
+        if self._cerrado:
+            return
+        self._cerrado = True
+        if final:
+            self.guardar()
+        self._ejecutor.shutdown(wait=True)
+        if self._escritura is not None:
+            self._escritura.result()  # Propaga errores de escritura
@@ -0,0 +1,221 @@
+"""Corridas por lotes del simulador de tornados, sin interfaz gráfica.
+
+Ejemplos:
+    python -m tornado_cli run --particles 1000000 --steps 5000 --seed 7 --out run.npz
+    python -m tornado_cli run --steps 5000 --checkpoint estado.npz --checkpoint-every 1000
+    python -m tornado_cli run --resume estado.npz --steps 5000
+    python -m tornado_cli run --particles 100000 --steps 2000 --rate 25 --lifetime 10 --record trayectorias/
+    python -m tornado_cli run --steps 500 --dt 0.1 --integrator rotacion --max-angle 0.1
+    python -m tornado_cli sweep --circulation 0.5 1 2 --R0 0.05 0.1 --steps 500 --seed 7 --out barrido.jsonl
+    python -m tornado_cli video --particles 200000 --frames 1500 --render raster --out tornado.mp4
+"""
+import argparse
+import json
+import math
+import time
+import numpy as np
+from tornado_checkpoint import Checkpointer, cargar
+from tornado_engine import TornadoEngine, FPS_REFERENCIA, PARAMETROS
+from tornado_kernels import INTEGRADORES
+from trajectory_store import TrajectoryRecorder
+from tornado_ensemble import barrido, run_ensemble
+
+
+def parametros_motor(args):
+    return dict(
+        radius_max=args.radius_max,
+        R0=args.R0,
+        circulation=args.circulation,
+        particles_per_second=args.rate,
+        particle_lifetime=args.lifetime,
+        max_velocidad=args.max_velocidad,
+        integrador=args.integrator,
+        angulo_maximo=args.max_angle,
+    )
+
+
+def comando_run(args):
+    if args.resume:
+        # Continúa una corrida guardada: partículas, parámetros, núcleo y generador vienen del
+        # checkpoint; --kernel explícito cambia el núcleo (en float32 ya no continúa bit a bit)
+        opciones = {'nucleo': args.kernel} if args.kernel is not None else {}
+        engine = cargar(args.resume, hilos=args.threads, **opciones)
+        print(f'Reanudando {args.resume} desde el frame {engine.frame_count}')
+    else:
+        engine = TornadoEngine(seed=args.seed, dtype=args.dtype, hilos=args.threads,
+                               nucleo=args.kernel or 'auto', **parametros_motor(args))
+        engine.spawn(args.particles)
+    checkpointer = Checkpointer(engine, args.checkpoint, args.checkpoint_every) if args.checkpoint else None
+    grabador = None
+    if args.record:
+        try:
+            grabador = TrajectoryRecorder(args.record, engine, args.record_fields, args.record_every)
+        except ValueError as error:
+            raise SystemExit(f'--record-fields: {error}')
+
+    actualizaciones = 0
+    inicio = time.perf_counter()
+    for _ in range(args.steps):
+        engine.step(args.dt)
+        actualizaciones += len(engine)
+        if checkpointer is not None:
+            checkpointer.tal_vez_guardar()
+        if grabador is not None:
+            grabador.tal_vez_registrar(engine)
+    duracion = time.perf_counter() - inicio
+
+    engine.close()
+    if checkpointer is not None:
+        checkpointer.cerrar()
+    if grabador is not None:
+        grabador.cerrar()
+
+    resumen = engine.resumen()
+    resumen['segundos'] = duracion
+    resumen['pasos_por_segundo'] = args.steps / duracion if duracion > 0 else float('inf')
+    resumen['actualizaciones_por_segundo'] = actualizaciones / duracion if duracion > 0 else float('inf')
+
+    print(f'{args.steps} pasos en {duracion:.2f} s (núcleo {engine.nucleo})')
+    print(f'Pasos/s: {resumen["pasos_por_segundo"]:.1f}')
+    print(f'Actualizaciones de partícula/s: {resumen["actualizaciones_por_segundo"]:.3e}')
+    print(json.dumps(resumen, indent=2))
+
+    if args.out:
+        np.savez_compressed(args.out, x=engine.x, y=engine.y, vx=engine.vx, vy=engine.vy,
+                            life_time=engine.life_time,
+                            resumen=json.dumps(sin_no_finitos(resumen), allow_nan=False),
+                            parametros=json.dumps(sin_no_finitos({nombre: getattr(engine, nombre)
+                                                                  for nombre in PARAMETROS}), allow_nan=False))
+        print(f'Estado final guardado en {args.out}')
+
+
+def sin_no_finitos(valor):
+    # JSON no admite inf ni nan (json.dumps escribiría Infinity/NaN): se guardan como null,
+    # por ejemplo el tiempo de vida infinito por defecto
+    if isinstance(valor, dict):
+        return {clave: sin_no_finitos(v) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [sin_no_finitos(v) for v in valor]
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def comando_sweep(args):
+    miembros = barrido(**parametros_motor(args))
+    print(f'{len(miembros)} miembros en el ensamble')
+
+    salida = open(args.out, 'w') if args.out else None
+    inicio = time.perf_counter()
+    for indice, parametros, resumen in run_ensemble(miembros, args.steps, args.particles, args.dt,
+                                                    args.seed, args.workers):
+        registro = json.dumps(sin_no_finitos({'miembro': indice, 'parametros': parametros, 'resumen': resumen}),
+                              allow_nan=False)
+        print(registro)
+        if salida:
+            salida.write(registro + '\n')
+            salida.flush()
+    if salida:
+        salida.close()
+    print(f'Ensamble completado en {time.perf_counter() - inicio:.2f} s')
+
+
+def comando_video(args):
+    # matplotlib y cartopy se importan solo aquí: run y sweep siguen sin dependencias gráficas
+    from tornado_video import exportar_video
+
+    engine = TornadoEngine(seed=args.seed, **parametros_motor(args))
+    engine.spawn(args.particles)
+    inicio = time.perf_counter()
+    frames = exportar_video(engine, args.out, args.frames, dt=args.dt, pasos_por_frame=args.steps_per_frame,
+                            fps=args.fps, ancho=args.width, alto=args.height, render=args.render,
+                            max_workers=args.workers, ffmpeg=args.ffmpeg)
+    duracion = time.perf_counter() - inicio
+    engine.close()
+    print(f'{frames} frames en {duracion:.2f} s ({frames / duracion:.1f} frames/s) -> {args.out}')
+
+
+def agregar_parametros_fisicos(parser, varios=False):
+    # En un barrido cada parámetro acepta varios valores
+    nargs = '+' if varios else None
+
+    def parametro(nombre, tipo, defecto, ayuda, **opciones):
+        parser.add_argument(nombre, type=tipo, nargs=nargs, default=[defecto] if varios else defecto, help=ayuda,
+                            **opciones)
+
+    parametro('--radius-max', float, 1.0, 'Radio máximo del tornado')
+    parametro('--R0', float, 0.1, 'Radio del núcleo del vórtice de Rankine')
+    parametro('--circulation', float, 1.0, 'Circulación del vórtice')
+    parametro('--rate', float, 0, 'Partículas emitidas por segundo durante la corrida (admite fracciones)')
+    parametro('--lifetime', float, float('inf'), 'Tiempo de vida de las partículas en segundos (por defecto no expiran)')
+    parametro('--max-velocidad', float, 0.01, 'Velocidad máxima de las partículas')
+    parametro('--integrator', str, 'euler', 'Integrador de la advección', choices=tuple(INTEGRADORES))
+    parametro('--max-angle', float, None,
+              'Giro máximo por paso en radianes: las partículas que giren más se subdividen en subpasos')
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog='tornado_cli', description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    run = subparsers.add_parser('run', help='Ejecuta una simulación sin dibujar')
+    run.add_argument('--particles', type=int, default=100000, help='Partículas iniciales')
+    run.add_argument('--steps', type=int, default=1000, help='Número de pasos de simulación')
+    run.add_argument('--dt', type=float, default=1 / FPS_REFERENCIA, help='Paso de tiempo en segundos')
+    run.add_argument('--seed', type=int, default=None, help='Semilla del generador aleatorio')
+    run.add_argument('--out', default=None, help='Archivo .npz para el estado final y el resumen')
+    run.add_argument('--dtype', choices=('float64', 'float32'), default='float64',
+                     help='Precisión del estado de las partículas')
+    run.add_argument('--threads', type=int, default=1, help='Hilos para el paso de física')
+    run.add_argument('--kernel', choices=('auto', 'numpy', 'numba'), default=None,
+                     help='Núcleo del paso de física (por defecto auto: numba si está instalado; '
+                          'con --resume, el del checkpoint)')
+    run.add_argument('--checkpoint', default=None,
+                     help='Archivo .npz de checkpoint (admite {frame} para guardar uno por checkpoint)')
+    run.add_argument('--checkpoint-every', type=int, default=500, help='Frames entre checkpoints')
+    run.add_argument('--resume', default=None, help='Checkpoint desde el que continuar la corrida')
+    run.add_argument('--record', default=None, help='Carpeta donde grabar las trayectorias de cada paso')
+    run.add_argument('--record-fields', nargs='+', default=None,
+                     help='Campos a grabar: ids, x, y, vx, vy, life_time, dist o atributos registrados '
+                          '(por defecto ids, x, y, dist y todos los atributos registrados)')
+    run.add_argument('--record-every', type=int, default=1, help='Pasos entre frames grabados')
+    agregar_parametros_fisicos(run)
+    run.set_defaults(funcion=comando_run)
+
+    sweep = subparsers.add_parser('sweep', help='Barrido de parámetros en un pool de procesos')
+    sweep.add_argument('--particles', type=int, default=10000, help='Partículas iniciales por miembro')
+    sweep.add_argument('--steps', type=int, default=1000, help='Número de pasos por miembro')
+    sweep.add_argument('--dt', type=float, default=1 / FPS_REFERENCIA, help='Paso de tiempo en segundos')
+    sweep.add_argument('--seed', type=int, default=None, help='Semilla raíz del ensamble')
+    sweep.add_argument('--workers', type=int, default=None, help='Procesos en paralelo (por defecto, todos los núcleos)')
+    sweep.add_argument('--out', default=None, help='Archivo JSON Lines con un resumen por miembro')
+    agregar_parametros_fisicos(sweep, varios=True)
+    sweep.set_defaults(funcion=comando_sweep)
+
+    video = subparsers.add_parser('video', help='Exporta la simulación a MP4 o a una secuencia de PNG')
+    video.add_argument('--out', required=True, help='Archivo .mp4/.mkv/.mov/.avi, o carpeta para los PNG')
+    video.add_argument('--particles', type=int, default=10000, help='Partículas iniciales')
+    video.add_argument('--frames', type=int, default=500, help='Número de frames del video')
+    video.add_argument('--steps-per-frame', type=int, default=1, help='Pasos de simulación por frame')
+    video.add_argument('--dt', type=float, default=1 / FPS_REFERENCIA, help='Paso de tiempo en segundos')
+    video.add_argument('--fps', type=int, default=FPS_REFERENCIA, help='Frames por segundo del video')
+    video.add_argument('--width', type=int, default=1920, help='Ancho del video en píxeles')
+    video.add_argument('--height', type=int, default=1080, help='Alto del video en píxeles')
+    video.add_argument('--render', choices=('scatter', 'raster'), default='scatter',
+                       help='Dibujo de las partículas (raster para poblaciones grandes)')
+    video.add_argument('--seed', type=int, default=None, help='Semilla del generador aleatorio')
+    video.add_argument('--workers', type=int, default=None, help='Procesos de dibujo (por defecto, todos los núcleos)')
+    video.add_argument('--ffmpeg', default='ffmpeg', help='Ejecutable de ffmpeg')
+    agregar_parametros_fisicos(video)
+    video.set_defaults(funcion=comando_video)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    args.funcion(args)
+
+
+if __name__ == '__main__':
+    main()
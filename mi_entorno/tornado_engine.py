@@ -0,0 +1,329 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from particle_pool import ParticlePool
+from tornado_kernels import INTEGRADORES, auxiliares, elegir_nucleo
+
+# Las velocidades del modelo son desplazamientos por frame a 50 FPS (la animación original)
+FPS_REFERENCIA = 50
+
+# Partículas por bloque del núcleo de física (buffers auxiliares que caben en caché L2)
+TAMANO_BLOQUE = 16384
+
+# Candidatos para el ajuste automático del bloque y tamaño mínimo de población para ajustarlo
+BLOQUES_CANDIDATOS = (4096, 8192, 16384, 32768, 65536, 131072)
+MINIMO_AJUSTE = 1 << 18
+
+# Parámetros físicos y de emisión que forman parte del estado de una corrida
+PARAMETROS = ('radius_max', 'R0', 'circulation', 'particles_per_second', 'particle_lifetime',
+              'max_velocidad', 'lon_center', 'lat_center', 'radio_dominio', 'integrador', 'angulo_maximo')
+
+# Campos por partícula que usa el propio motor; los demás se declaran con registrar_atributo
+CAMPOS_MOTOR = ('id', 'x', 'y', 'vx', 'vy', 'dist', 't_muerte')
+
+
+class TornadoEngine:
+    # Núcleo de la simulación sin interfaz gráfica: solo arreglos de NumPy, sin matplotlib ni
+    # cartopy, para poder ejecutarlo en servidores o trabajos por lotes
+    def __init__(self, radius_max=1.0, R0=0.1, circulation=1.0, particles_per_second=1,
+                 particle_lifetime=5.0, max_velocidad=0.01, lon_center=-100, lat_center=35,
+                 seed=None, dtype=np.float64, hilos=1, tamano_bloque=None, nucleo='auto', radio_dominio=None,
+                 integrador='euler', angulo_maximo=None):
+        self.radius_max = radius_max
+        self.R0 = R0  # Radio del núcleo sólido del vórtice de Rankine
+        self.circulation = circulation  # Circulación del vórtice
+        self.particles_per_second = particles_per_second
+        self.particle_lifetime = particle_lifetime
+        self.max_velocidad = max_velocidad
+        self.lon_center, self.lat_center = lon_center, lat_center
+        self.radio_dominio = radio_dominio  # Las partículas que salen de este radio mueren (None: sin límite)
+
+        # Integrador de la advección ('euler', 'rk2', 'rk4' o 'rotacion', ver tornado_kernels) y giro
+        # máximo en radianes por paso: las partículas que girarían más se subdividen en subpasos
+        # (None: un paso por partícula). Definen cuántos buffers auxiliares usa el núcleo, así que
+        # cambiarlos después de crear el motor los vuelve a asignar (ver los setters)
+        self._scratch_hilos = None
+        self.integrador = integrador
+        self.angulo_maximo = angulo_maximo
+
+        self.rng = np.random.default_rng(seed)
+        self.frame_count = 0
+        self.reloj = 0.0  # Tiempo de simulación en segundos
+        self.acumulado_emision = 0.0  # Fracción de partícula pendiente de emitir (ver emitir)
+
+        # Precisión del estado de las partículas y de los buffers del núcleo. Con float32 se
+        # reduce a la mitad el tráfico de memoria; t_muerte sigue en float64 porque se compara
+        # con el reloj, que crece sin límite durante la corrida
+        self.dtype = np.dtype(dtype)
+
+        # t_muerte es el instante en que expira cada partícula; id es un identificador persistente
+        # que no cambia al expirar o compactar (ver ParticlePool.buscar). dist (distancia al
+        # centro del último paso, usada para colorear) vive en el pool para que expirar y
+        # eliminar la mantengan alineada con x e y
+        self.pool = ParticlePool(('x', 'y', 'vx', 'vy', 'dist', 't_muerte'), campo_orden='t_muerte',
+                                 dtype=self.dtype, dtypes={'t_muerte': np.float64}, campo_id='id')
+
+        # Ejecución en hilos: NumPy libera el GIL dentro de los ufuncs, así que cada hilo avanza
+        # su propio tramo de partículas con sus propios buffers auxiliares. Sin tamano_bloque,
+        # el bloque se ajusta midiendo la primera vez que la población es grande
+        self.hilos = max(1, hilos)
+        self._ejecutor = ThreadPoolExecutor(self.hilos) if self.hilos > 1 else None
+        self._bloque_ajustado = tamano_bloque is not None
+
+        # Núcleo del paso de física: 'numba' (bucle compilado y fusionado), 'numpy' o 'auto'
+        self.nucleo, self._nucleo = elegir_nucleo(nucleo)
+        if self.nucleo != 'numpy':
+            self._bloque_ajustado = True  # El bucle compilado no usa bloques de caché
+        self._asignar_bloque(tamano_bloque or TAMANO_BLOQUE)
+
+    def __len__(self):
+        return len(self.pool)
+
+    def registrar_atributo(self, nombre, dtype=None, defecto=0):
+        # Declara un atributo por partícula (temperatura, masa, tipo de escombro...). Desde ese
+        # momento se emite, expira, elimina, guarda en checkpoints y graba junto con x e y, y se
+        # lee como engine.<nombre>; las partículas vivas toman el valor por defecto
+        # Un nombre de la clase, del estado del motor (reloj, rng, pool...) o de sus parámetros
+        # taparía al atributo, que __getattr__ solo resuelve cuando no hay otro con ese nombre
+        if hasattr(type(self), nombre) or nombre in self.__dict__ or nombre in PARAMETROS:
+            raise ValueError(f'{nombre!r} es un nombre reservado del motor')
+        self.pool.registrar(nombre, dtype if dtype is not None else self.dtype, defecto)
+
+    @property
+    def atributos(self):
+        return tuple(campo for campo in self.pool.campos if campo not in CAMPOS_MOTOR)
+
+    def __getattr__(self, nombre):
+        # Solo se llama si no hay un atributo normal: resuelve los atributos registrados
+        pool = self.__dict__.get('pool')
+        if pool is not None and nombre in pool.campos:
+            return pool.vista(nombre)
+        raise AttributeError(f'{type(self).__name__!r} no tiene el atributo {nombre!r}')
+
+    @property
+    def x(self):
+        return self.pool.vista('x')
+
+    @property
+    def y(self):
+        return self.pool.vista('y')
+
+    @property
+    def vx(self):
+        return self.pool.vista('vx')
+
+    @property
+    def vy(self):
+        return self.pool.vista('vy')
+
+    @property
+    def dist(self):
+        return self.pool.vista('dist')
+
+    @property
+    def ids(self):
+        return self.pool.vista('id')
+
+    def indices(self, ids):
+        # Posición actual (en x, y, ...) de cada id, o -1 si la partícula ya no existe
+        return self.pool.buscar(ids)
+
+    @property
+    def life_time(self):
+        return self.pool.vista('t_muerte') - self.reloj
+
+    def spawn(self, n, **atributos):
+        # Emisión por lotes: todas las posiciones nuevas se generan en una sola pasada vectorizada.
+        # atributos da valores (escalares o arreglos de n) a los atributos registrados; los que
+        # no se pasan toman su valor por defecto
+        angle = self.rng.uniform(0, 2 * np.pi, n)
+        radius = self.rng.uniform(0, self.radius_max, n)
+        new_x = radius * np.cos(angle)
+        new_y = radius * np.sin(angle)
+        new_vx, new_vy = self.calculate_vortex_velocity(new_x, new_y)
+
+        self.pool.agregar(n, x=new_x, y=new_y, vx=new_vx, vy=new_vy, dist=radius,
+                          t_muerte=self.reloj + self.particle_lifetime, **atributos)
+
+    def emitir(self, dt):
+        # Emisión en tiempo continuo: cada paso suma particles_per_second * dt a un acumulador y
+        # emite su parte entera en un solo lote; la fracción pasa al paso siguiente. Así cualquier
+        # tasa (0.1 o 10^7 por segundo) se respeta sin depender de los FPS ni del tamaño del paso
+        if self.particles_per_second <= 0:
+            return
+        self.acumulado_emision += self.particles_per_second * dt
+        # La tolerancia evita perder una partícula cuando la suma de fracciones queda apenas
+        # por debajo de un entero por redondeo (0.1 * 0.02 sumado 500 veces da 0.9999...)
+        n = int(self.acumulado_emision + 1e-9)
+        if n > 0:
+            self.acumulado_emision -= n
+            self.spawn(n)
+
+    def calculate_vortex_velocity(self, x, y):
+        # Vórtice de Rankine evaluado sobre arreglos: núcleo (r < R0) y región exterior
+        r = np.sqrt(x**2 + y**2)
+        v_theta = self.circulation / (2 * np.pi * np.where(r < self.R0, self.R0, r))
+
+        theta = np.arctan2(y, x)
+        vx = v_theta * np.cos(theta + np.pi / 2)
+        vy = v_theta * np.sin(theta + np.pi / 2)
+
+        return vx, vy
+
+    def cull(self):
+        # Las partículas se crean en orden, así que expirar es solo avanzar el inicio del pool
+        self.pool.expirar(self.reloj)
+        if self.radio_dominio is not None:
+            x, y = self.x, self.y
+            self.eliminar_donde(x * x + y * y > self.radio_dominio ** 2)
+
+    def eliminar(self, indices):
+        # Muertes arbitrarias (salida del dominio, absorción, límite de velocidad...) con
+        # swap-remove en el pool: el costo es proporcional a las muertes, no a N
+        self.pool.eliminar(indices)
+
+    def eliminar_donde(self, mascara):
+        self.eliminar(np.flatnonzero(mascara))
+
+    def step(self, dt=1 / FPS_REFERENCIA):
+        self.frame_count += 1
+
+        self.emitir(dt)
+
+        self.reloj += dt
+        self.cull()
+
+        n = len(self)
+        if not self._bloque_ajustado and n >= MINIMO_AJUSTE:
+            self._ajustar_bloque()
+
+        self._paso_fisico(self.x, self.y, self.vx, self.vy, self.dist, dt * FPS_REFERENCIA)
+
+    def _paso_fisico(self, x, y, vx, vy, dist, pasos):
+        parametros = (float(self.circulation), float(self.radius_max), float(self.max_velocidad), pasos,
+                      float(self.angulo_maximo or 0.0), self.integrador)
+        n = x.size
+        if self._ejecutor is None or n < 2 * self.tamano_bloque:
+            self._nucleo(x, y, vx, vy, dist, self._scratch_hilos[0], *parametros)
+            return
+
+        # Un tramo contiguo por hilo, cada uno recorrido en bloques del tamaño de caché
+        limites = np.linspace(0, n, self.hilos + 1).astype(int)
+        futuros = [self._ejecutor.submit(self._nucleo, x[a:b], y[a:b], vx[a:b], vy[a:b], dist[a:b],
+                                         aux, *parametros)
+                   for a, b, aux in zip(limites[:-1], limites[1:], self._scratch_hilos)]
+        for futuro in futuros:
+            futuro.result()
+
+    @property
+    def integrador(self):
+        return self._integrador
+
+    @integrador.setter
+    def integrador(self, integrador):
+        if integrador not in INTEGRADORES:
+            raise ValueError(f'Integrador desconocido: {integrador} (disponibles: {", ".join(INTEGRADORES)})')
+        self._integrador = integrador
+        self._reasignar_auxiliares()
+
+    @property
+    def angulo_maximo(self):
+        return self._angulo_maximo
+
+    @angulo_maximo.setter
+    def angulo_maximo(self, angulo_maximo):
+        self._angulo_maximo = angulo_maximo
+        self._reasignar_auxiliares()
+
+    def _reasignar_auxiliares(self):
+        # rk2 y rk4 usan más buffers que euler, y los subpasos adaptativos dos más para el estado
+        # inicial: con menos, el núcleo fallaría o usaría como estado inicial buffers intermedios
+        if self._scratch_hilos is not None:
+            self._asignar_bloque(self.tamano_bloque)
+
+    def _asignar_bloque(self, tamano):
+        self.tamano_bloque = tamano
+        cantidad = auxiliares(self.integrador, self.angulo_maximo)
+        self._scratch_hilos = [tuple(np.empty(tamano, dtype=self.dtype) for _ in range(cantidad))
+                               for _ in range(self.hilos)]
+
+    def _ajustar_bloque(self):
+        # Mide cada bloque candidato sobre una copia de una muestra de la población (el resultado
+        # no depende del bloque, solo el tiempo) y se queda con el más rápido
+        m = min(len(self), 1 << 21)
+        muestra = [campo[:m].copy() for campo in (self.x, self.y, self.vx, self.vy)]
+        dist = np.empty(m, dtype=self.dtype)
+        tiempos = {}
+        for tamano in BLOQUES_CANDIDATOS:
+            self._asignar_bloque(tamano)
+            self._paso_fisico(*muestra, dist, 1.0)  # Calentamiento
+            inicio = time.perf_counter()
+            self._paso_fisico(*muestra, dist, 1.0)
+            tiempos[tamano] = time.perf_counter() - inicio
+        self._asignar_bloque(min(tiempos, key=tiempos.get))
+        self._bloque_ajustado = True
+
+    def close(self):
+        if self._ejecutor is not None:
+            self._ejecutor.shutdown()
+            self._ejecutor = None
+
+    def run(self, pasos, dt=1 / FPS_REFERENCIA):
+        for _ in range(pasos):
+            self.step(dt)
+
+    def capturar_estado(self):
+        # Copia de todo lo que determina la continuación de la corrida: las partículas vivas,
+        # los contadores, los parámetros y el estado del generador aleatorio. Es una copia, así
+        # que puede escribirse a disco en otro hilo mientras el motor sigue avanzando
+        return {
+            'campos': {campo: self.pool.vista(campo).copy() for campo in self.pool.campos},
+            'frame_count': self.frame_count,
+            'reloj': self.reloj,
+            'acumulado_emision': self.acumulado_emision,
+            'siguiente_id': self.pool.siguiente_id,
+            'ordenado': self.pool.ordenado,
+            'atributos': {nombre: (self.pool.dtypes[nombre].str, np.asarray(self.pool.defectos[nombre]).item())
+                          for nombre in self.atributos},
+            'parametros': {nombre: getattr(self, nombre) for nombre in PARAMETROS},
+            'dtype': self.dtype.name,
+            'nucleo': self.nucleo,
+            'rng': self.rng.bit_generator.state,
+        }
+
+    @classmethod
+    def restaurar_estado(cls, estado, **opciones):
+        # Motor que continúa exactamente donde se capturó el estado; opciones son ajustes de
+        # ejecución (hilos, tamano_bloque, nucleo). Hilos y bloque no cambian el resultado; el
+        # núcleo sí en float32 (numpy y numba redondean distinto), así que por defecto se usa el
+        # guardado y pasar otro renuncia a que la continuación sea idéntica bit a bit
+        opciones.setdefault('nucleo', estado.get('nucleo', 'auto'))
+        engine = cls(dtype=estado['dtype'], **estado['parametros'], **opciones)
+        engine.rng.bit_generator.state = estado['rng']
+        engine.frame_count = estado['frame_count']
+        engine.reloj = estado['reloj']
+        engine.acumulado_emision = estado.get('acumulado_emision', 0.0)
+        for nombre, (dtype, defecto) in estado.get('atributos', {}).items():
+            engine.registrar_atributo(nombre, dtype, defecto)
+        campos = estado['campos']
+        engine.pool.agregar(len(campos[engine.pool.campo_orden]), **campos)
+        engine.pool.siguiente_id = max(engine.pool.siguiente_id, estado.get('siguiente_id', 0))
+        # Con el mismo modo de expiración (FIFO o swap-remove) la continuación es idéntica
+        engine.pool.ordenado = engine.pool.ordenado and estado.get('ordenado', True)
+        return engine
+
+    def resumen(self):
+        # Estadísticas reducidas del estado actual (para corridas por lotes)
+        r = np.sqrt(self.x**2 + self.y**2)
+        velocidad = np.sqrt(self.vx**2 + self.vy**2)
+        vacio = len(self) == 0
+        return {
+            'frames': self.frame_count,
+            'tiempo': self.reloj,
+            'particulas': len(self),
+            'radio_medio': 0.0 if vacio else float(r.mean()),
+            'radio_std': 0.0 if vacio else float(r.std()),
+            'radio_max': 0.0 if vacio else float(r.max()),
+            'velocidad_media': 0.0 if vacio else float(velocidad.mean()),
+            'velocidad_max': 0.0 if vacio else float(velocidad.max()),
+        }
@@ -0,0 +1,29 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from tornado_engine import TornadoEngine, FPS_REFERENCIA
+
+
+def barrido(**valores):
+    # Producto cartesiano de parámetros: barrido(circulation=[0.5, 1.0], R0=[0.05, 0.1])
+    nombres = list(valores)
+    return [dict(zip(nombres, combinacion)) for combinacion in itertools.product(*valores.values())]
+
+
+def correr_miembro(indice, parametros, pasos, particulas, dt, semilla):
+    # Cada miembro tiene su propio flujo aleatorio, derivado solo de su índice en el ensamble
+    engine = TornadoEngine(seed=semilla, **parametros)
+    engine.spawn(particulas)
+    engine.run(pasos, dt)
+    return indice, parametros, engine.resumen()
+
+
+def run_ensemble(miembros, pasos, particulas=10000, dt=1 / FPS_REFERENCIA, seed=None, max_workers=None):
+    # Reparte los miembros en un pool de procesos y entrega (índice, parámetros, resumen) a medida
+    # que terminan. Los resultados no dependen del número de workers ni del orden de finalización.
+    semillas = np.random.SeedSequence(seed).spawn(len(miembros))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futuros = [pool.submit(correr_miembro, i, parametros, pasos, particulas, dt, semillas[i])
+                   for i, parametros in enumerate(miembros)]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
@@ -0,0 +1,347 @@
+import numpy as np
+
+# Núcleos del paso de física. Trabajan sobre vistas de los arreglos del pool y buffers
+# auxiliares preasignados (aux), escribiendo siempre con out= para no crear temporales.
+#
+# Integradores: 'euler' (el original), 'rk2' (punto medio), 'rk4' y 'rotacion' (giro exacto de la
+# parte azimutal del campo). Todos dejan en vx, vy la velocidad media del paso, de modo que
+# x - vx * pasos es la posición al inicio del paso (la usa la interpolación de SimulationClock).
+# Con angulo_maximo, las partículas que giran más que eso en un paso (las del núcleo) se
+# subdividen en los subpasos necesarios, cada una por su cuenta.
+
+
+def campo_velocidad(x, y, vx, vy, dist, tmp, tmp2, circulation, radius_max, max_velocidad):
+    # Distancia al centro, limitada para evitar divisiones por cero. Se limita dist^2 para
+    # reutilizarla abajo (np.hypot evita desbordes pero es varias veces más lento)
+    np.multiply(x, x, out=tmp)
+    np.multiply(y, y, out=tmp2)
+    tmp += tmp2
+    np.clip(tmp, 0.01**2, radius_max**2, out=tmp)
+    np.sqrt(tmp, out=dist)
+
+    # Velocidad angular inversamente proporcional a la distancia:
+    # v = circulation / (2 pi dist) * (y, -x) / dist = k * (y, -x), con k = circulation / (2 pi dist^2)
+    np.divide(circulation / (2 * np.pi), tmp, out=tmp)
+    np.multiply(y, tmp, out=vx)
+    np.multiply(x, tmp, out=vy)
+
+    # vy = 0.0002 * dist - k * x
+    np.multiply(dist, 0.0002, out=tmp2)
+    np.subtract(tmp2, vy, out=vy)
+
+    # Limita la rapidez: factor = sqrt(min(1, max_velocidad^2 / |v|^2))
+    np.multiply(vx, vx, out=tmp)
+    np.multiply(vy, vy, out=tmp2)
+    tmp += tmp2
+    np.divide(max_velocidad**2, tmp, out=tmp)
+    np.minimum(tmp, 1.0, out=tmp)
+    np.sqrt(tmp, out=tmp)
+    vx *= tmp
+    vy *= tmp
+
+
+def paso_numpy(x, y, vx, vy, dist, tmp, tmp2, circulation, radius_max, max_velocidad, pasos):
+    campo_velocidad(x, y, vx, vy, dist, tmp, tmp2, circulation, radius_max, max_velocidad)
+
+    if np.ndim(pasos) == 0 and pasos == 1:
+        x += vx
+        y += vy
+    else:
+        np.multiply(vx, pasos, out=tmp)
+        x += tmp
+        np.multiply(vy, pasos, out=tmp)
+        y += tmp
+
+
+def paso_euler(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos):
+    paso_numpy(x, y, vx, vy, dist, aux[0], aux[1], circulation, radius_max, max_velocidad, pasos)
+
+
+def paso_rk2(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos):
+    # Punto medio: la velocidad se evalúa a mitad del paso y con ella se avanza el paso entero
+    tmp, tmp2, px, py, dist_medio = aux[:5]
+    campo_velocidad(x, y, vx, vy, dist, tmp, tmp2, circulation, radius_max, max_velocidad)
+    mitad = pasos * 0.5
+    np.multiply(vx, mitad, out=px)
+    px += x
+    np.multiply(vy, mitad, out=py)
+    py += y
+    campo_velocidad(px, py, vx, vy, dist_medio, tmp, tmp2, circulation, radius_max, max_velocidad)
+    np.multiply(vx, pasos, out=tmp)
+    x += tmp
+    np.multiply(vy, pasos, out=tmp)
+    y += tmp
+
+
+def paso_rk4(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos):
+    # Runge-Kutta clásico: k1 en el inicio, k2 y k3 a mitad del paso, k4 al final
+    tmp, tmp2, px, py, dist_etapa, kx, ky, sx, sy = aux[:9]
+    campo_velocidad(x, y, vx, vy, dist, tmp, tmp2, circulation, radius_max, max_velocidad)
+    np.copyto(sx, vx)
+    np.copyto(sy, vy)
+    etapa_x, etapa_y = vx, vy
+    for fraccion, peso in ((0.5, 2), (0.5, 2), (1.0, 1)):
+        np.multiply(etapa_x, pasos * fraccion, out=px)
+        px += x
+        np.multiply(etapa_y, pasos * fraccion, out=py)
+        py += y
+        campo_velocidad(px, py, kx, ky, dist_etapa, tmp, tmp2, circulation, radius_max, max_velocidad)
+        np.multiply(kx, peso, out=tmp)
+        sx += tmp
+        np.multiply(ky, peso, out=tmp)
+        sy += tmp
+        etapa_x, etapa_y = kx, ky
+    # Velocidad media del paso: (k1 + 2 k2 + 2 k3 + k4) / 6
+    np.multiply(sx, 1 / 6, out=vx)
+    np.multiply(sy, 1 / 6, out=vy)
+    np.multiply(vx, pasos, out=tmp)
+    x += tmp
+    np.multiply(vy, pasos, out=tmp)
+    y += tmp
+
+
+def campo_rotacion(x, y, omega, deriva, dist, tmp, tmp2, circulation, radius_max, max_velocidad):
+    # El mismo campo que campo_velocidad, separado en un giro rígido alrededor del centro,
+    # v = omega * (y, -x), y la deriva hacia el norte (0, 0.0002 * dist), ambos ya limitados
+    np.multiply(x, x, out=tmp)
+    np.multiply(y, y, out=tmp2)
+    tmp += tmp2
+    np.clip(tmp, 0.01**2, radius_max**2, out=tmp)
+    np.sqrt(tmp, out=dist)
+    np.divide(circulation / (2 * np.pi), tmp, out=omega)
+    np.multiply(y, omega, out=tmp)
+    np.multiply(x, omega, out=tmp2)
+    np.multiply(dist, 0.0002, out=deriva)
+    np.subtract(deriva, tmp2, out=tmp2)
+    # Mismo factor de límite de rapidez que campo_velocidad, aplicado a las dos partes
+    np.multiply(tmp, tmp, out=tmp)
+    np.multiply(tmp2, tmp2, out=tmp2)
+    tmp += tmp2
+    np.divide(max_velocidad**2, tmp, out=tmp)
+    np.minimum(tmp, 1.0, out=tmp)
+    np.sqrt(tmp, out=tmp)
+    omega *= tmp
+    deriva *= tmp
+
+
+def paso_rotacion(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos):
+    # La parte azimutal conserva la distancia al centro: en lugar de avanzar en línea recta
+    # (Euler saca a las partículas en espiral) se rota la posición el ángulo omega * pasos.
+    # Solo la deriva, mucho menor, se integra con Euler
+    tmp, tmp2, omega, deriva, x0, y0 = aux[:6]
+    campo_rotacion(x, y, omega, deriva, dist, tmp, tmp2, circulation, radius_max, max_velocidad)
+    np.copyto(x0, x)
+    np.copyto(y0, y)
+    np.multiply(omega, -pasos, out=omega)  # Ángulo del paso (sentido horario)
+    np.cos(omega, out=tmp)
+    np.sin(omega, out=tmp2)
+    np.multiply(x0, tmp, out=x)
+    np.multiply(y0, tmp2, out=vx)
+    x -= vx
+    np.multiply(x0, tmp2, out=y)
+    np.multiply(y0, tmp, out=vy)
+    y += vy
+    deriva *= pasos
+    y += deriva
+    np.subtract(x, x0, out=vx)
+    vx /= pasos
+    np.subtract(y, y0, out=vy)
+    vy /= pasos
+
+
+INTEGRADORES = {'euler': paso_euler, 'rk2': paso_rk2, 'rk4': paso_rk4, 'rotacion': paso_rotacion}
+
+# Buffers auxiliares por bloque que usa cada integrador (más dos con subpasos adaptativos)
+AUXILIARES = {'euler': 2, 'rk2': 5, 'rk4': 9, 'rotacion': 6}
+
+
+def auxiliares(integrador, angulo_maximo=0.0):
+    return AUXILIARES[integrador] + (2 if angulo_maximo else 0)
+
+
+def paso_adaptativo(integrar, x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos,
+                    angulo_maximo):
+    # Se da el paso completo a todas las partículas y las que giraron más de angulo_maximo
+    # alrededor del centro (las del núcleo, donde la velocidad angular es máxima) se rehacen
+    # desde su posición inicial en m = ceil(giro / angulo_maximo) subpasos. Ordenadas por m de
+    # mayor a menor, las que siguen activas en cada subpaso son un prefijo contiguo
+    x0, y0 = aux[-2], aux[-1]
+    np.copyto(x0, x)
+    np.copyto(y0, y)
+    integrar(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos)
+
+    giro, tmp = aux[0], aux[1]
+    np.multiply(vx, vx, out=giro)
+    np.multiply(vy, vy, out=tmp)
+    giro += tmp
+    np.sqrt(giro, out=giro)
+    giro /= dist
+    giro *= pasos / angulo_maximo
+    indices = np.flatnonzero(giro > 1)
+    if indices.size == 0:
+        return
+
+    subpasos = np.ceil(giro[indices])
+    orden = np.argsort(-subpasos, kind='stable')
+    indices, subpasos = indices[orden], subpasos[orden]
+    n = indices.size
+    sx, sy = x0[indices], y0[indices]
+    svx, svy, sdist = (np.empty(n, dtype=x.dtype) for _ in range(3))
+    saux = tuple(np.empty(n, dtype=x.dtype) for _ in range(len(aux) - 2))
+    h = pasos / subpasos
+    for j in range(int(subpasos[0])):
+        k = int(np.searchsorted(-subpasos, -j, side='left'))  # Partículas con más de j subpasos
+        integrar(sx[:k], sy[:k], svx[:k], svy[:k], sdist[:k], tuple(b[:k] for b in saux),
+                 circulation, radius_max, max_velocidad, h[:k])
+    x[indices] = sx
+    y[indices] = sy
+    vx[indices] = (sx - x0[indices]) / pasos
+    vy[indices] = (sy - y0[indices]) / pasos
+
+
+def paso_por_bloques(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos, angulo_maximo=0.0,
+                     integrador='euler'):
+    # Recorre las partículas en bloques del tamaño de los buffers auxiliares: así los
+    # ~20 pases del núcleo reutilizan datos en caché en lugar de ir a memoria principal
+    integrar = INTEGRADORES[integrador]
+    bloque = aux[0].size
+    for inicio in range(0, x.size, bloque):
+        fin = min(inicio + bloque, x.size)
+        m = fin - inicio
+        partes = (x[inicio:fin], y[inicio:fin], vx[inicio:fin], vy[inicio:fin], dist[inicio:fin],
+                  tuple(b[:m] for b in aux))
+        if angulo_maximo:
+            paso_adaptativo(integrar, *partes, circulation, radius_max, max_velocidad, pasos, angulo_maximo)
+        else:
+            integrar(*partes, circulation, radius_max, max_velocidad, pasos)
+
+
+# Núcleo compilado opcional: con Numba instalado, todo el paso se fusiona en un solo bucle por
+# partícula (una lectura y una escritura de cada arreglo). Sin Numba se usa el núcleo de NumPy.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _paso_fusionado(x, y, vx, vy, dist, circulation, radius_max, max_velocidad, pasos):
+    # Mismas operaciones que campo_velocidad + paso_numpy, partícula por partícula
+    k0 = circulation / (2 * np.pi)
+    minimo, maximo = 0.01**2, radius_max**2
+    max_v2 = max_velocidad**2
+    for i in range(x.size):
+        xi, yi = x[i], y[i]
+        d2 = min(max(xi * xi + yi * yi, minimo), maximo)
+        d = np.sqrt(d2)
+
+        k = k0 / d2
+        vxi = yi * k
+        vyi = 0.0002 * d - xi * k
+
+        # Sin ramas, para que el compilador pueda vectorizar el bucle
+        factor = np.sqrt(min(max_v2 / (vxi * vxi + vyi * vyi), 1.0))
+        vxi *= factor
+        vyi *= factor
+
+        vx[i] = vxi
+        vy[i] = vyi
+        dist[i] = d
+        x[i] = xi + vxi * pasos
+        y[i] = yi + vyi * pasos
+
+
+def _velocidad(xi, yi, k0, minimo, maximo, max_v2):
+    # Velocidad del campo en un punto, su distancia al centro (limitada), y la velocidad angular y
+    # la deriva del giro, con las mismas operaciones que campo_velocidad y campo_rotacion
+    d2 = min(max(xi * xi + yi * yi, minimo), maximo)
+    d = np.sqrt(d2)
+    k = k0 / d2
+    vxi = yi * k
+    vyi = 0.0002 * d - xi * k
+    factor = np.sqrt(min(max_v2 / (vxi * vxi + vyi * vyi), 1.0))
+    return vxi * factor, vyi * factor, d, k * factor, 0.0002 * d * factor
+
+
+def _integrar(xi, yi, h, metodo, k0, minimo, maximo, max_v2):
+    # Un paso de h frames desde (xi, yi): posición final, velocidad media y distancia inicial
+    vx1, vy1, d, omega, deriva = _velocidad(xi, yi, k0, minimo, maximo, max_v2)
+    if metodo == 0:
+        return xi + vx1 * h, yi + vy1 * h, vx1, vy1, d
+    if metodo == 1:
+        mitad = h * 0.5
+        vx2, vy2, _, _, _ = _velocidad(vx1 * mitad + xi, vy1 * mitad + yi, k0, minimo, maximo, max_v2)
+        return xi + vx2 * h, yi + vy2 * h, vx2, vy2, d
+    if metodo == 2:
+        mitad = h * 0.5
+        vx2, vy2, _, _, _ = _velocidad(vx1 * mitad + xi, vy1 * mitad + yi, k0, minimo, maximo, max_v2)
+        vx3, vy3, _, _, _ = _velocidad(vx2 * mitad + xi, vy2 * mitad + yi, k0, minimo, maximo, max_v2)
+        vx4, vy4, _, _, _ = _velocidad(vx3 * h + xi, vy3 * h + yi, k0, minimo, maximo, max_v2)
+        mvx = (vx1 + vx2 * 2 + vx3 * 2 + vx4) * (1 / 6)
+        mvy = (vy1 + vy2 * 2 + vy3 * 2 + vy4) * (1 / 6)
+        return xi + mvx * h, yi + mvy * h, mvx, mvy, d
+    angulo = omega * -h
+    c, s = np.cos(angulo), np.sin(angulo)
+    xn = xi * c - yi * s
+    yn = xi * s + yi * c + deriva * h
+    return xn, yn, (xn - xi) / h, (yn - yi) / h, d
+
+
+def _paso_integrado(x, y, vx, vy, dist, circulation, radius_max, max_velocidad, pasos, metodo, angulo_maximo):
+    # Mismos integradores y subpasos adaptativos que paso_por_bloques, partícula por partícula:
+    # aquí cada partícula hace directamente sus m subpasos, sin reordenar
+    k0 = circulation / (2 * np.pi)
+    minimo, maximo = 0.01**2, radius_max**2
+    max_v2 = max_velocidad**2
+    for i in range(x.size):
+        xi, yi = x[i], y[i]
+        xn, yn, mvx, mvy, d = _integrar(xi, yi, pasos, metodo, k0, minimo, maximo, max_v2)
+        if angulo_maximo > 0:
+            giro = np.sqrt(mvx * mvx + mvy * mvy) / d * (pasos / angulo_maximo)
+            if giro > 1:
+                m = int(np.ceil(giro))
+                h = pasos / m
+                xn, yn = xi, yi
+                for _ in range(m):
+                    xn, yn, _, _, _ = _integrar(xn, yn, h, metodo, k0, minimo, maximo, max_v2)
+                mvx = (xn - xi) / pasos
+                mvy = (yn - yi) / pasos
+        x[i] = xn
+        y[i] = yn
+        vx[i] = mvx
+        vy[i] = mvy
+        dist[i] = d
+
+
+if numba is not None:
+    # nogil: los hilos del motor pueden ejecutar el núcleo compilado en paralelo
+    _paso_fusionado = numba.njit(nogil=True, cache=True)(_paso_fusionado)
+    _velocidad = numba.njit(nogil=True, cache=True)(_velocidad)
+    _integrar = numba.njit(nogil=True, cache=True)(_integrar)
+    _paso_integrado = numba.njit(nogil=True, cache=True)(_paso_integrado)
+
+METODOS = {nombre: codigo for codigo, nombre in enumerate(INTEGRADORES)}  # Códigos de _integrar
+
+
+def paso_compilado(x, y, vx, vy, dist, aux, circulation, radius_max, max_velocidad, pasos, angulo_maximo=0.0,
+                   integrador='euler'):
+    # Misma firma que paso_por_bloques; no necesita buffers auxiliares. Euler sin subpasos sigue
+    # usando el bucle fusionado original
+    if integrador == 'euler' and not angulo_maximo:
+        _paso_fusionado(x, y, vx, vy, dist, circulation, radius_max, max_velocidad, pasos)
+    else:
+        _paso_integrado(x, y, vx, vy, dist, circulation, radius_max, max_velocidad, pasos, METODOS[integrador],
+                        float(angulo_maximo))
+
+
+NUCLEOS = {'numpy': paso_por_bloques}
+if numba is not None:
+    NUCLEOS['numba'] = paso_compilado
+
+
+def elegir_nucleo(nombre='auto'):
+    # 'auto' usa el núcleo compilado si Numba está disponible
+    if nombre == 'auto':
+        nombre = 'numba' if 'numba' in NUCLEOS else 'numpy'
+    if nombre not in NUCLEOS:
+        raise ValueError(f'Núcleo no disponible: {nombre} (disponibles: {", ".join(NUCLEOS)})')
+    return nombre, NUCLEOS[nombre]
@@ -1,49 +1,96 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 from matplotlib.widgets import Slider, Button
+from tornado_engine import TornadoEngine, FPS_REFERENCIA
+from particle_render import RENDERERS
+from frame_profiler import FrameProfiler
+from basemap_cache import dibujar_basemap
+from tornado_checkpoint import Checkpointer
+from trajectory_replay import ReplayEngine
+from simulation_clock import SimulationClock
+
+EXTENSION_MAPA = [-130, -65, 24, 50]
 
 class TornadoSimulator:
-    def __init__(self, num_particulas, num_frames):
+    # Vista interactiva sobre el mapa: la física vive en TornadoEngine y esta clase solo
+    # dibuja su estado y traduce los controles a parámetros del motor. Con replay (carpeta de
+    # una grabación o ReplayEngine) reproduce una corrida grabada sin recalcular la física.
+    # En vivo, un SimulationClock avanza el motor en pasos fijos de paso_fijo segundos según el
+    # tiempo real (por escala_tiempo), independientemente de lo que tarde cada frame en dibujarse
+    def __init__(self, num_particulas, num_frames, engine=None, perfilar=False, hud=True, perfil_salida=None, cache_mapa=True,
+                 render='scatter', checkpoint=None, checkpoint_cada=500, replay=None, color='dist', rango=None,
+                 paso_fijo=1 / FPS_REFERENCIA, escala_tiempo=1.0):
         self.num_particulas = num_particulas
         self.num_frames = num_frames
-        self.radius_max = 1.0
-        self.lon_center, self.lat_center = -100, 35
-        self.R0 = 0.1  # Radio del núcleo sólido del vórtice de Rankine
-        self.circulation = 1.0  # Circulación del vórtice
+        if replay is not None:
+            engine = replay if isinstance(replay, ReplayEngine) else ReplayEngine(replay)
+        self.replay = engine if isinstance(engine, ReplayEngine) else None
+        self.engine = engine if engine is not None else TornadoEngine()
+        self.intervalo = 50  # ms entre frames de la animación
 
         # Configura la figura y el eje
         self.fig, self.ax = plt.subplots(figsize=(14, 10), subplot_kw={'projection': ccrs.PlateCarree()})
-        self.ax.set_extent([-130, -65, 24, 50], crs=ccrs.PlateCarree())  # Ajusta la extensión del mapa
-        self.ax.add_feature(cfeature.COASTLINE)
-        self.ax.add_feature(cfeature.BORDERS)
-        self.ax.add_feature(cfeature.STATES)
-        self.ax.add_feature(cfeature.LAND, edgecolor='black')
-        self.ax.add_feature(cfeature.OCEAN)
-        self.ax.add_feature(cfeature.LAKES, edgecolor='black')
-        self.ax.add_feature(cfeature.RIVERS)
+        # Mapa base: con cache_mapa las siete capas de Natural Earth se rasterizan una vez y se guardan
+        # en disco (ver basemap_cache); los arranques siguientes cargan una sola imagen
+        self.basemap = dibujar_basemap(self.ax, EXTENSION_MAPA, usar_cache=cache_mapa)
         self.ax.gridlines(draw_labels=True)
 
-        self.init_particles()
+        # 'scatter' (un punto de matplotlib por partícula) o 'raster' (imagen acumulada con NumPy,
+        # para poblaciones de cientos de miles a millones de partículas). color elige el campo que
+        # da el color: la distancia al centro o un atributo registrado en el motor
+        self.renderer = RENDERERS[render](self.ax, self.engine, color=color, rango=rango, transform=ccrs.PlateCarree())
+        self.particulas = self.renderer.particulas
+
+        self.replay_text = None
+        self.reloj_text = None
+        if self.replay is None:
+            self.crear_controles_fisicos()
+        else:
+            self.crear_controles_reproduccion()
 
-        self.particulas = self.ax.scatter(self.lon_center + self.x, self.lat_center + self.y, c='blue', transform=ccrs.PlateCarree())
+        self.cid = self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        self.anim = None
 
+        # Checkpoints periódicos (y uno final al cerrar la ventana); para continuar una corrida
+        # se pasa engine=tornado_checkpoint.cargar(ruta)
+        self.checkpointer = None
+        if checkpoint:
+            self.checkpointer = Checkpointer(self.engine, checkpoint, checkpoint_cada)
+            self.fig.canvas.mpl_connect('close_event', lambda event: self.checkpointer.cerrar())
+
+        # Los checkpoints se revisan tras cada paso fijo: con varios pasos por frame, uno que caiga
+        # a mitad del frame no se saltea
+        self.reloj_sim = None
+        if self.replay is None:
+            self.reloj_sim = SimulationClock(self.engine, paso_fijo, escala_tiempo,
+                                             despues_del_paso=self.checkpointer and self.checkpointer.tal_vez_guardar)
+
+        # Instrumentación opcional de cada fase del frame (sin costo si está desactivada)
+        self.profiler = None
+        self.hud_text = None
+        if perfilar:
+            self.activar_perfil(hud, perfil_salida)
+
+    def crear_controles_fisicos(self):
         # Configuración de sliders y botones
         self.slider_radius = plt.axes([0.2, 0.02, 0.65, 0.03], facecolor='lightgoldenrodyellow')
-        self.slider_radius_bar = Slider(self.slider_radius, 'Radio del Tornado', 0.1, 10.0, valinit=self.radius_max, valstep=0.1)
+        self.slider_radius_bar = Slider(self.slider_radius, 'Radio del Tornado', 0.1, 10.0, valinit=self.engine.radius_max, valstep=0.1)
         self.slider_radius_bar.on_changed(self.update_radius)
 
         self.slider_velocity = plt.axes([0.2, 0.06, 0.65, 0.03], facecolor='lightgoldenrodyellow')
-        self.slider_velocity_bar = Slider(self.slider_velocity, 'Velocidad de Partículas', 0.001, 2.0, valinit=0.01, valstep=0.001)
+        self.slider_velocity_bar = Slider(self.slider_velocity, 'Velocidad de Partículas', 0.001, 2.0, valinit=self.engine.max_velocidad, valstep=0.001)
         self.slider_velocity_bar.on_changed(self.update_velocity)
 
-        self.particles_value = 1
-        self.lifetime_value = 5.0
+        self.particles_value = self.engine.particles_per_second
+        self.lifetime_value = self.engine.particle_lifetime
+
+        # Tiempo simulado, segundos simulados por segundo real y pasos por frame
+        self.reloj_text = self.ax.text(0.99, 0.01, '', transform=self.ax.transAxes, fontsize=10, family='monospace',
+                                       ha='right', va='bottom', bbox=dict(facecolor='white', alpha=0.7), zorder=10)
 
         # Layout de los controles con más espacio
-        self.text_particles_label = plt.text(0.24, 0.14, f'Partículas/s: {self.particles_value}', transform=self.fig.transFigure,
+        self.text_particles_label = plt.text(0.24, 0.14, f'Partículas/s: {self.particles_value:g}', transform=self.fig.transFigure,
                                              fontsize=12, color='black', ha='center', va='center')
 
         self.increase_particles_button = plt.axes([0.3, 0.12, 0.05, 0.03], facecolor='lightgoldenrodyellow')
@@ -65,131 +112,158 @@ class TornadoSimulator:
         self.increase_lifetime.on_clicked(self.increase_lifetime_per_second)
         self.decrease_lifetime.on_clicked(self.decrease_lifetime_per_second)
 
-        self.cid = self.fig.canvas.mpl_connect('button_press_event', self.on_click)
-        self.anim = None
-        self.frame_count = 0
-        self.particles_per_second = self.particles_value
-        self.particle_lifetime = self.lifetime_value
-
-    def init_particles(self):
-        self.x = np.array([])
-        self.y = np.array([])
-        self.vx = np.array([])
-        self.vy = np.array([])
-        self.life_time = np.array([])
-
-    def add_particle(self):
-        for _ in range(self.particles_per_second):
-            angle = np.random.uniform(0, 2 * np.pi)
-            radius = np.random.uniform(0, self.radius_max)
-            new_x = radius * np.cos(angle)
-            new_y = radius * np.sin(angle)
-            new_vx, new_vy = self.calculate_vortex_velocity(new_x, new_y)
-            new_life_time = np.array([self.particle_lifetime])
-
-            self.x = np.append(self.x, new_x)
-            self.y = np.append(self.y, new_y)
-            self.vx = np.append(self.vx, new_vx)
-            self.vy = np.append(self.vy, new_vy)
-            self.life_time = np.append(self.life_time, new_life_time)
-
-    def calculate_vortex_velocity(self, x, y):
-        r = np.sqrt(x**2 + y**2)
-        if r < self.R0:
-            v_theta = self.circulation / (2 * np.pi * self.R0)
+    def crear_controles_reproduccion(self):
+        # Barra para ir a cualquier frame y atajos de teclado (que no chocan con los de la
+        # barra de herramientas de matplotlib)
+        self.slider_frame = plt.axes([0.2, 0.06, 0.65, 0.03], facecolor='lightgoldenrodyellow')
+        self.slider_frame_bar = Slider(self.slider_frame, 'Frame', 0, max(1, self.replay.frames - 1), valinit=0, valstep=1)
+        self.slider_frame_bar.on_changed(self.seek_frame)
+        self.text_replay_ayuda = plt.text(0.525, 0.12, 'Espacio: pausa   , / .: frame anterior / siguiente   '
+                                          '- / +: velocidad   x: reversa   0 / 9: inicio / fin',
+                                          transform=self.fig.transFigure, fontsize=11, ha='center', va='center')
+        self.replay_text = self.ax.text(0.99, 0.01, '', transform=self.ax.transAxes, fontsize=10, family='monospace',
+                                        ha='right', va='bottom', bbox=dict(facecolor='white', alpha=0.7), zorder=10)
+        self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+
+    def activar_perfil(self, hud=True, perfil_salida=None):
+        self.profiler = FrameProfiler(intervalo=self.intervalo)
+        self.profiler.instrumentar_frame(self, 'update')
+        if self.replay is None:
+            self.profiler.instrumentar(self.engine, 'spawn', 'emision')
+            self.profiler.instrumentar(self.engine, 'cull', 'expiracion')
+            self.profiler.instrumentar(self.engine, '_paso_fisico', 'fisica')
         else:
-            v_theta = self.circulation / (2 * np.pi * r)
-        
-        theta = np.arctan2(y, x)
-        vx = v_theta * np.cos(theta + np.pi / 2)
-        vy = v_theta * np.sin(theta + np.pi / 2)
-        
-        return vx, vy
+            # En reproducción no hay física: se mide la espera del frame precargado
+            self.profiler.instrumentar(self.engine, '_mostrar', 'fisica')
+        self.profiler.instrumentar(self.renderer, 'actualizar', 'offsets_colores')
+        # Dibujo: redibujados completos de la figura más el dibujo de las partículas y el blit
+        self.profiler.instrumentar(self.fig, 'draw', 'dibujo')
+        self.profiler.instrumentar(self.particulas, 'draw', 'dibujo')
+        self.profiler.instrumentar(self.fig.canvas, 'blit', 'dibujo')
+        if hud:
+            # En coordenadas del eje del mapa para que se redibuje con el blit de las partículas
+            self.hud_text = self.ax.text(0.01, 0.99, '', transform=self.ax.transAxes, fontsize=9, family='monospace',
+                                         va='top', bbox=dict(facecolor='white', alpha=0.7), zorder=10)
+        if perfil_salida:
+            self.fig.canvas.mpl_connect('close_event', lambda event: self.profiler.exportar(perfil_salida))
+
+    def artistas_animados(self):
+        artistas = (self.particulas,)
+        if self.hud_text is not None:
+            artistas += (self.hud_text,)
+        if self.replay_text is not None:
+            artistas += (self.replay_text,)
+        if self.reloj_text is not None:
+            artistas += (self.reloj_text,)
+        return artistas
+
+    def init_anim(self):
+        return self.artistas_animados()
 
     def update(self, frame):
-        self.frame_count += 1
-
-        if self.frame_count % (50 // self.particles_per_second) == 0:
-            self.add_particle()
-
-        self.life_time -= 1 / 50  # Aproximadamente 50 frames por segundo
-
-        mask = self.life_time > 0
-        self.x = self.x[mask]
-        self.y = self.y[mask]
-        self.vx = self.vx[mask]
-        self.vy = self.vy[mask]
-        self.life_time = self.life_time[mask]
-
-        centro_x, centro_y = 0, 0
-
-        dx = centro_x - self.x
-        dy = centro_y - self.y
-        dist = np.sqrt(dx**2 + dy**2)
-        dist = np.clip(dist, 0.01, self.radius_max)  # Evitar divisiones por cero
-
-        # Velocidad angular inversamente proporcional a la distancia
-        v_theta = self.circulation / (2 * np.pi * dist)
-        self.vx = v_theta * -dy / dist
-        self.vy = v_theta * dx / dist
-
-        self.vy += 0.0002 * dist
-
-        max_velocidad = self.slider_velocity_bar.val
-        velocidad = np.sqrt(self.vx**2 + self.vy**2)
-        self.vx = np.where(velocidad > max_velocidad, self.vx * max_velocidad / velocidad, self.vx)
-        self.vy = np.where(velocidad > max_velocidad, self.vy * max_velocidad / velocidad, self.vy)
-
-        self.x += self.vx
-        self.y += self.vy
-
-        self.particulas.set_offsets(np.c_[self.lon_center + self.x, self.lat_center + self.y])
-
-        # Colores según la distancia al centro (más azul cuando está lejos, más rojo cuando está cerca)
-        colors = plt.cm.coolwarm(1 - dist / self.radius_max)
-        self.particulas.set_color(colors)
+        if self.reloj_sim is None:
+            self.engine.step()
+            self.renderer.actualizar(self.engine)
+        else:
+            self.reloj_sim.avanzar()
+            self.renderer.actualizar(self.reloj_sim.visible())
+        if self.hud_text is not None and frame % 10 == 0:
+            self.hud_text.set_text(self.profiler.texto_hud())
+        if self.reloj_text is not None and frame % 10 == 0:
+            reloj = self.reloj_sim
+            self.reloj_text.set_text(f't = {reloj.reloj_visible:.2f} s  {reloj.tasa():.2f} s/s  '
+                                     f'{reloj.pasos_frame} pasos/frame')
+        if self.replay is not None:
+            self.actualizar_reproduccion(frame)
+        return self.artistas_animados()
+
+    def actualizar_reproduccion(self, frame):
+        replay = self.replay
+        estado = ' (pausa)' if replay.pausado else ''
+        self.replay_text.set_text(f'frame {replay.posicion + 1}/{replay.frames}  t = {replay.reloj:.2f} s  '
+                                  f'x{replay.velocidad}{estado}')
+        # La barra está fuera del área animada: moverla exige un redibujado completo, así que
+        # se sincroniza de vez en cuando y sin disparar seek_frame
+        if frame % 50 == 0:
+            self.slider_frame_bar.valmax = max(1, replay.frames - 1)
+            self.slider_frame.set_xlim(0, self.slider_frame_bar.valmax)
+            self.slider_frame_bar.eventson = False
+            self.slider_frame_bar.set_val(replay.posicion)
+            self.slider_frame_bar.eventson = True
+
+    def seek_frame(self, valor):
+        self.replay.seek(int(valor))
+
+    def on_key(self, event):
+        replay = self.replay
+        if event.key == ' ':
+            replay.pausado = not replay.pausado
+        elif event.key in ('.', ','):
+            replay.pausado = True
+            replay.paso(1 if event.key == '.' else -1)
+        elif event.key == '+':
+            replay.velocidad *= 2
+        elif event.key == '-':
+            replay.velocidad = replay.velocidad // 2 or (1 if replay.velocidad > 0 else -1)
+        elif event.key == 'x':
+            replay.velocidad = -replay.velocidad
+        elif event.key == '0':
+            replay.seek(0)
+        elif event.key == '9':
+            replay.seek(replay.frames - 1)
 
     def animate(self):
-        self.anim = animation.FuncAnimation(self.fig, self.update, frames=self.num_frames, interval=50, repeat=True)
+        # Con blit, el mapa base (costas, fronteras, estados, ríos, grilla) se dibuja una vez y se
+        # guarda como imagen de fondo; en cada frame solo se restaura y se dibujan las partículas.
+        # FuncAnimation vuelve a capturar el fondo cuando cambia la extensión del eje (zoom,
+        # desplazamiento) o el tamaño de la figura. Cambiar el centro del tornado solo mueve las
+        # partículas, así que no invalida el fondo.
+        self.anim = animation.FuncAnimation(self.fig, self.update, init_func=self.init_anim, frames=self.num_frames,
+                                            interval=self.intervalo, repeat=True, blit=True)
         plt.show()
 
     def update_radius(self, radius):
-        self.radius_max = radius
+        self.engine.radius_max = radius
         print(f'Radio del tornado actualizado: {radius:.2f}')
 
     def update_velocity(self, velocity):
         # Actualiza la velocidad de partículas usando el valor del slider
+        self.engine.max_velocidad = velocity
         print(f'Velocidad de partículas actualizada: {velocity:.3f}')
 
     def increase_particles_per_second(self, event):
         self.particles_value += 1
-        self.particles_per_second = self.particles_value
-        self.text_particles_label.set_text(f'Partículas/s: {self.particles_value}')
+        self.engine.particles_per_second = self.particles_value
+        self.text_particles_label.set_text(f'Partículas/s: {self.particles_value:g}')
+        self.fig.canvas.draw_idle()  # Fuera del área animada: requiere un redibujado completo
 
     def decrease_particles_per_second(self, event):
         if self.particles_value > 1:
             self.particles_value -= 1
-            self.particles_per_second = self.particles_value
-            self.text_particles_label.set_text(f'Partículas/s: {self.particles_value}')
+            self.engine.particles_per_second = self.particles_value
+            self.text_particles_label.set_text(f'Partículas/s: {self.particles_value:g}')
+            self.fig.canvas.draw_idle()
 
     def increase_lifetime_per_second(self, event):
         self.lifetime_value += 1.0
-        self.particle_lifetime = self.lifetime_value
+        self.engine.particle_lifetime = self.lifetime_value
         self.text_lifetime_label.set_text(f'Tiempo de Vida: {self.lifetime_value:.2f}')
+        self.fig.canvas.draw_idle()
 
     def decrease_lifetime_per_second(self, event):
         if self.lifetime_value > 1.0:
             self.lifetime_value -= 1.0
-            self.particle_lifetime = self.lifetime_value
+            self.engine.particle_lifetime = self.lifetime_value
             self.text_lifetime_label.set_text(f'Tiempo de Vida: {self.lifetime_value:.2f}')
+            self.fig.canvas.draw_idle()
 
     def on_click(self, event):
-        if event.inaxes == self.ax:
-            self.lon_center, self.lat_center = event.xdata, event.ydata
-            print(f'Nuevo centro del tornado: ({self.lon_center:.2f}, {self.lat_center:.2f})')
+        if event.inaxes == self.ax and self.replay is None:
+            self.engine.lon_center, self.engine.lat_center = event.xdata, event.ydata
+            print(f'Nuevo centro del tornado: ({self.engine.lon_center:.2f}, {self.engine.lat_center:.2f})')
 
 if __name__ == '__main__':
     num_particulas = 500
     num_frames = 500
     sim = TornadoSimulator(num_particulas, num_frames)
-    sim.animate()
\ No newline at end of file
+    sim.animate()
@@ -0,0 +1,140 @@
+"""Exportación de corridas a video (MP4 vía ffmpeg) o a una secuencia de PNG, sin ventana.
+
+El motor se simula en el proceso principal; cada frame se dibuja con Agg en un grupo de procesos
+(cada uno con su figura, el mapa base del caché y el fondo ya rasterizado) y los buffers RGBA se
+escriben en orden en la entrada de ffmpeg, sin archivos intermedios.
+"""
+import os
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import cartopy.crs as ccrs
+import matplotlib.image as mimage
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from basemap_cache import dibujar_basemap
+from particle_render import RENDERERS, rango_color
+
+EXTENSIONES_VIDEO = ('.mp4', '.mkv', '.mov', '.avi')
+DPI = 100
+
+_trabajador = None  # Figura y renderer de cada proceso, creados por _iniciar_trabajador
+
+
+def instantanea(engine, color='dist'):
+    # Lo que necesita un renderer para dibujar un frame, en float32 para abaratar el envío
+    estado = SimpleNamespace(
+        lon_center=engine.lon_center,
+        lat_center=engine.lat_center,
+        radius_max=engine.radius_max,
+        reloj=engine.reloj,
+        x=engine.x.astype(np.float32),
+        y=engine.y.astype(np.float32),
+    )
+    setattr(estado, color, getattr(engine, color).astype(np.float32))
+    return estado
+
+
+def crear_figura(ancho, alto, extent, render, cache_mapa=True, color='dist', rango=None):
+    # Figura Agg fuera de pantalla (sin pyplot): sirve en procesos sin ventana
+    fig = Figure(figsize=(ancho / DPI, alto / DPI), dpi=DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_axes([0.02, 0.02, 0.96, 0.96], projection=ccrs.PlateCarree())
+    dibujar_basemap(ax, extent, usar_cache=cache_mapa)
+    vacio = SimpleNamespace(lon_center=0.0, lat_center=0.0, radius_max=1.0, x=np.empty(0), y=np.empty(0),
+                            **{color: np.empty(0)})
+    renderer = RENDERERS[render](ax, vacio, color=color, rango=rango, transform=ccrs.PlateCarree(), animated=True)
+    texto = ax.text(0.01, 0.99, '', transform=ax.transAxes, va='top', fontsize=14, animated=True,
+                    bbox=dict(facecolor='white', alpha=0.7))
+    return fig, ax, renderer, texto
+
+
+def _iniciar_trabajador(ancho, alto, extent, render, cache_mapa, color, rango, carpeta_png):
+    # Como el blit de la vista: el mapa se dibuja una vez y cada frame restaura ese fondo
+    global _trabajador
+    fig, ax, renderer, texto = crear_figura(ancho, alto, extent, render, cache_mapa, color, rango)
+    fig.canvas.draw()
+    fondo = fig.canvas.copy_from_bbox(fig.bbox)
+    _trabajador = (fig, ax, renderer, texto, fondo, carpeta_png)
+
+
+def renderizar_frame(indice, estado):
+    fig, ax, renderer, texto, fondo, carpeta_png = _trabajador
+    fig.canvas.restore_region(fondo)
+    renderer.actualizar(estado)
+    ax.draw_artist(renderer.particulas)
+    texto.set_text(f't = {estado.reloj:.2f} s')
+    ax.draw_artist(texto)
+    if carpeta_png is not None:
+        # Desde el buffer: print_png volvería a dibujar la figura sin los artistas animados
+        mimage.imsave(os.path.join(carpeta_png, f'frame_{indice:06d}.png'), np.asarray(fig.canvas.buffer_rgba()))
+        return None
+    return bytes(fig.canvas.buffer_rgba())
+
+
+def abrir_codificador(ruta, ancho, alto, fps, ffmpeg='ffmpeg'):
+    if shutil.which(ffmpeg) is None:
+        raise RuntimeError(f'No se encontró {ffmpeg!r}; instálelo o exporte una secuencia de PNG')
+    comando = [ffmpeg, '-y', '-loglevel', 'error',
+               '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{ancho}x{alto}', '-r', str(fps), '-i', '-',
+               '-c:v', 'libx264', '-pix_fmt', 'yuv420p', ruta]
+    return subprocess.Popen(comando, stdin=subprocess.PIPE)
+
+
+def exportar_video(engine, ruta, frames, dt=1 / 50, pasos_por_frame=1, fps=50, ancho=1920, alto=1080,
+                   extent=(-130, -65, 24, 50), render='scatter', max_workers=None, cache_mapa=True,
+                   ffmpeg='ffmpeg', color='dist', rango=None):
+    # ruta terminada en .mp4/.mkv/.mov/.avi -> video con ffmpeg; cualquier otra -> carpeta de PNG.
+    # color es el campo con que se colorean las partículas (la distancia o un atributo registrado);
+    # sin rango, el de un atributo se toma de sus valores al empezar. Devuelve el número de frames escritos.
+    extent = list(extent)
+    if rango is None and color != 'dist':
+        rango = rango_color(engine, color, None)
+    max_workers = max_workers or os.cpu_count() or 1
+    carpeta_png = None
+    codificador = None
+    if ruta.lower().endswith(EXTENSIONES_VIDEO):
+        codificador = abrir_codificador(ruta, ancho, alto, fps, ffmpeg)
+    else:
+        carpeta_png = ruta
+        os.makedirs(carpeta_png, exist_ok=True)
+
+    # Llena el caché del mapa base antes de crear los procesos, para que no lo dibujen todos a la vez
+    if cache_mapa:
+        crear_figura(ancho, alto, extent, render, cache_mapa, color, rango)
+
+    # Ventana acotada de frames en vuelo: mantiene ocupados a los procesos sin acumular memoria
+    pendientes = deque()
+    escritos = 0
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=_iniciar_trabajador,
+                                 initargs=(ancho, alto, extent, render, cache_mapa, color, rango, carpeta_png)) as ejecutor:
+            for indice in range(frames):
+                for _ in range(pasos_por_frame):
+                    engine.step(dt)
+                pendientes.append(ejecutor.submit(renderizar_frame, indice, instantanea(engine, color)))
+                if len(pendientes) >= 2 * max_workers:
+                    escritos += _escribir(pendientes.popleft().result(), codificador)
+            while pendientes:
+                escritos += _escribir(pendientes.popleft().result(), codificador)
+    finally:
+        # ffmpeg se cierra y se espera también si falló el dibujo o un proceso; su código de salida
+        # se revisa después, para no tapar con él la excepción que ya está en curso
+        if codificador is not None:
+            try:
+                codificador.stdin.close()
+            except BrokenPipeError:
+                pass
+            codificador.wait()
+    if codificador is not None and codificador.returncode != 0:
+        raise RuntimeError(f'ffmpeg terminó con código {codificador.returncode}')
+    return escritos
+
+
+def _escribir(buffer, codificador):
+    if codificador is not None:
+        codificador.stdin.write(buffer)
+    return 1
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from trajectory_store import TrajectoryReader
+
+
+class ReplayEngine:
+    # Reproduce una grabación de TrajectoryRecorder con la interfaz del motor que usa la vista
+    # (step, x, y, dist, centro, radio, reloj), sin recalcular física: cada paso solo lee un
+    # frame. Un hilo lee por adelantado los próximos frames en la dirección y velocidad actuales
+    # y los deja en memoria, así que el costo por frame es dibujar lo que ya está cargado.
+    def __init__(self, lector, velocidad=1, prefetch=16, bucle=True):
+        self.lector = TrajectoryReader(lector) if isinstance(lector, str) else lector
+        if len(self.lector) == 0:
+            raise ValueError('La grabación no tiene frames')
+        self.velocidad = velocidad  # Frames grabados por paso; negativa para reproducir hacia atrás
+        self.pausado = False
+        self.bucle = bucle  # Al llegar a un extremo vuelve al otro; si no, se detiene ahí
+        self.prefetch = prefetch
+        self.posicion = 0
+        self._ejecutor = ThreadPoolExecutor(1)
+        self._cache = OrderedDict()  # Índice de frame -> futuro con el frame en memoria
+        self._mostrar(0)
+
+    def __len__(self):
+        return len(self._estado.x)
+
+    # Lo que la vista lee del motor sale del frame actual. Cambiar el centro o el radio desde
+    # los controles no tiene efecto: la grabación manda
+    @property
+    def x(self):
+        return self._estado.x
+
+    @property
+    def y(self):
+        return self._estado.y
+
+    @property
+    def dist(self):
+        return self._estado.dist
+
+    @property
+    def frame_count(self):
+        return self._estado.frame_count
+
+    @property
+    def reloj(self):
+        return self._estado.reloj
+
+    @property
+    def lon_center(self):
+        return self._estado.lon_center
+
+    @lon_center.setter
+    def lon_center(self, valor):
+        pass
+
+    @property
+    def lat_center(self):
+        return self._estado.lat_center
+
+    @lat_center.setter
+    def lat_center(self, valor):
+        pass
+
+    @property
+    def radius_max(self):
+        return self._estado.radius_max
+
+    @radius_max.setter
+    def radius_max(self, valor):
+        pass
+
+    def __getattr__(self, nombre):
+        # Los demás campos grabados (atributos registrados del motor) también salen del frame
+        estado = self.__dict__.get('_estado')
+        if estado is not None and nombre in self.lector.campos:
+            return getattr(estado, nombre)
+        raise AttributeError(f'{type(self).__name__!r} no tiene el atributo {nombre!r}')
+
+    @property
+    def frames(self):
+        return len(self.lector)
+
+    def step(self, dt=None):
+        if not self.pausado:
+            self.posicion = self._desplazar(self.posicion, self.velocidad)
+        self._mostrar(self.posicion)
+
+    def seek(self, indice):
+        self.posicion = int(np.clip(indice, 0, self.frames - 1))
+        self._mostrar(self.posicion)
+
+    def paso(self, frames=1):
+        # Avance o retroceso manual (en pausa, frame a frame)
+        self.seek(self.posicion + frames)
+
+    def _desplazar(self, posicion, frames):
+        if self.bucle:
+            if not 0 <= posicion + frames < self.frames:
+                self.lector.actualizar()  # La grabación puede haber crecido mientras se reproduce
+            return (posicion + frames) % self.frames
+        return int(np.clip(posicion + frames, 0, self.frames - 1))
+
+    def _mostrar(self, indice):
+        self._estado = self._pedir(indice).result()
+        # Pide los próximos frames en la dirección de reproducción (en pausa, los vecinos)
+        salto = self.velocidad if not self.pausado and self.velocidad != 0 else 1
+        for k in range(1, self.prefetch + 1):
+            self._pedir(self._desplazar(indice, k * salto))
+        if self.pausado:
+            self._pedir(self._desplazar(indice, -1))
+        while len(self._cache) > 2 * self.prefetch + 2:
+            self._cache.popitem(last=False)
+
+    def _pedir(self, indice):
+        futuro = self._cache.get(indice)
+        if futuro is None:
+            futuro = self._cache[indice] = self._ejecutor.submit(self._cargar, indice)
+        else:
+            self._cache.move_to_end(indice)
+        return futuro
+
+    def _cargar(self, indice):
+        # Copia el frame a memoria (lectura de disco en el hilo de precarga)
+        estado = self.lector.frame(indice)
+        for campo in self.lector.campos:
+            setattr(estado, campo, np.array(getattr(estado, campo)))
+        if 'dist' not in self.lector.campos:
+            estado.dist = np.sqrt(estado.x * estado.x + estado.y * estado.y)
+        return estado
+
+    def close(self):
+        self._ejecutor.shutdown(wait=False, cancel_futures=True)
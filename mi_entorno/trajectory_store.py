@@ -0,0 +1,141 @@
+import json
+import os
+from types import SimpleNamespace
+import numpy as np
+
+# Un registro por frame grabado: dónde empiezan sus partículas en los archivos de campos, cuántas
+# son y el estado global necesario para dibujarlo (centro, radio, reloj)
+DTYPE_INDICE = np.dtype([('inicio', '<i8'), ('n', '<i8'), ('frame', '<i8'), ('reloj', '<f8'),
+                         ('lon_center', '<f8'), ('lat_center', '<f8'), ('radius_max', '<f8')])
+
+CAMPOS_POR_DEFECTO = ('ids', 'x', 'y', 'dist')
+CAMPOS_MOTOR = ('ids', 'x', 'y', 'vx', 'vy', 'life_time', 'dist')
+
+
+def campos_grabables(engine):
+    # Los campos por partícula del motor más los atributos registrados (ver registrar_atributo)
+    return CAMPOS_MOTOR + engine.atributos
+
+
+class TrajectoryRecorder:
+    # Graba las partículas de cada paso en una carpeta: un archivo binario plano por campo, al
+    # que cada frame se agrega con una sola escritura secuencial, y un índice de registros de
+    # tamaño fijo. Los datos se escriben antes que su entrada del índice, así que un lector
+    # (o un corte de la corrida) nunca ve un frame a medias; al reabrir la carpeta se descarta lo
+    # que un corte haya dejado sin su entrada en el índice (ver _reparar).
+    def __init__(self, ruta, engine, campos=None, cada=1):
+        self.ruta = ruta
+        self.cada = cada
+        os.makedirs(ruta, exist_ok=True)
+        ruta_meta = os.path.join(ruta, 'meta.json')
+        if os.path.exists(ruta_meta):
+            # Se continúa una grabación existente (por ejemplo, después de reanudar un checkpoint)
+            with open(ruta_meta) as archivo:
+                meta = json.load(archivo)
+            self.dtypes = {campo: np.dtype(dtype) for campo, dtype in meta['campos'].items()}
+        else:
+            # Por defecto se graban también todos los atributos registrados
+            if campos is None:
+                campos = CAMPOS_POR_DEFECTO + engine.atributos
+            desconocidos = [campo for campo in campos if campo not in campos_grabables(engine)]
+            if desconocidos:
+                raise ValueError(f'Campos desconocidos: {", ".join(desconocidos)} '
+                                 f'(disponibles: {", ".join(campos_grabables(engine))})')
+            self.dtypes = {campo: np.asarray(getattr(engine, campo)).dtype for campo in campos}
+            with open(ruta_meta, 'w') as archivo:
+                json.dump({'campos': {campo: dtype.str for campo, dtype in self.dtypes.items()}}, archivo)
+
+        self.total = self._reparar(engine.frame_count)
+        self._archivos = {campo: open(os.path.join(ruta, campo + '.bin'), 'ab') for campo in self.dtypes}
+        self._indice = open(os.path.join(ruta, 'indice.bin'), 'ab')
+
+    def _reparar(self, frame_actual):
+        # Deja la grabación en un estado consistente antes de agregarle frames: descarta un registro
+        # del índice a medio escribir, los datos de un frame cuyo registro no llegó a escribirse y,
+        # al continuar desde un checkpoint anterior al último frame grabado, los frames posteriores
+        # a frame_actual (si no, el frame grabado retrocedería y la reproducción saltaría atrás).
+        # Devuelve el total de partículas que quedan en los archivos de campos
+        ruta_indice = os.path.join(self.ruta, 'indice.bin')
+        registros = os.path.getsize(ruta_indice) // DTYPE_INDICE.itemsize if os.path.exists(ruta_indice) else 0
+        indice = np.fromfile(ruta_indice, dtype=DTYPE_INDICE, count=registros) if registros else \
+            np.empty(0, dtype=DTYPE_INDICE)
+        conservados = int(np.searchsorted(indice['frame'], frame_actual, side='right'))
+        total = int(indice['inicio'][conservados - 1] + indice['n'][conservados - 1]) if conservados else 0
+        with open(ruta_indice, 'ab') as archivo:
+            archivo.truncate(conservados * DTYPE_INDICE.itemsize)
+        for campo, dtype in self.dtypes.items():
+            with open(os.path.join(self.ruta, campo + '.bin'), 'ab') as archivo:
+                archivo.truncate(total * dtype.itemsize)
+        return total
+
+    def tal_vez_registrar(self, engine):
+        if engine.frame_count % self.cada == 0:
+            self.registrar(engine)
+
+    def registrar(self, engine):
+        n = len(engine)
+        for campo, archivo in self._archivos.items():
+            valores = np.ascontiguousarray(getattr(engine, campo), dtype=self.dtypes[campo])
+            archivo.write(memoryview(valores))
+            archivo.flush()
+        registro = np.array((self.total, n, engine.frame_count, engine.reloj, engine.lon_center,
+                             engine.lat_center, engine.radius_max), dtype=DTYPE_INDICE)
+        self._indice.write(registro.tobytes())
+        self._indice.flush()
+        self.total += n
+
+    def cerrar(self):
+        for archivo in self._archivos.values():
+            archivo.close()
+        self._indice.close()
+
+
+def _leer_indice(ruta):
+    # Solo los registros completos: el último puede estar a medio escribir
+    ruta_indice = os.path.join(ruta, 'indice.bin')
+    if not os.path.exists(ruta_indice):
+        return np.empty(0, dtype=DTYPE_INDICE)
+    registros = os.path.getsize(ruta_indice) // DTYPE_INDICE.itemsize
+    if registros == 0:
+        return np.empty(0, dtype=DTYPE_INDICE)
+    return np.memmap(ruta_indice, dtype=DTYPE_INDICE, mode='r', shape=(registros,))
+
+
+class TrajectoryReader:
+    # Acceso aleatorio a los frames grabados sin copiar: cada campo es un np.memmap del archivo
+    # y un frame son rebanadas de esos mapas. Puede leerse mientras la corrida sigue grabando;
+    # actualizar() (o pedir un frame posterior) vuelve a mapear lo que se agregó.
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(os.path.join(ruta, 'meta.json')) as archivo:
+            meta = json.load(archivo)
+        self.dtypes = {campo: np.dtype(dtype) for campo, dtype in meta['campos'].items()}
+        self.campos = tuple(self.dtypes)
+        self._mapas = {}
+        self.actualizar()
+
+    def actualizar(self):
+        self.indice = _leer_indice(self.ruta)
+        total = int(self.indice['inicio'][-1] + self.indice['n'][-1]) if len(self.indice) else 0
+        for campo, dtype in self.dtypes.items():
+            mapa = self._mapas.get(campo)
+            if total > 0 and (mapa is None or mapa.size < total):
+                self._mapas[campo] = np.memmap(os.path.join(self.ruta, campo + '.bin'), dtype=dtype,
+                                               mode='r', shape=(total,))
+        return len(self)
+
+    def __len__(self):
+        return len(self.indice)
+
+    def frame(self, i):
+        if i >= len(self):
+            self.actualizar()
+        registro = self.indice[i]
+        inicio, fin = int(registro['inicio']), int(registro['inicio'] + registro['n'])
+        # Mismos atributos que el motor, para que los renderers lo dibujen sin cambios
+        estado = SimpleNamespace(frame_count=int(registro['frame']), reloj=float(registro['reloj']),
+                                 lon_center=float(registro['lon_center']), lat_center=float(registro['lat_center']),
+                                 radius_max=float(registro['radius_max']))
+        for campo in self.campos:
+            setattr(estado, campo, self._mapas[campo][inicio:fin] if fin > inicio else np.empty(0, self.dtypes[campo]))
+        return estado